@@ -0,0 +1,170 @@
+"""
+Long-lived Stockfish engines for the analysis workers.
+
+Starting Stockfish costs a process spawn, loading the NNUE network and
+allocating the hash table. Each worker process keeps a small pool of engines
+alive across tasks instead:
+
+- An engine is pinged before it is handed out and replaced if it does not answer.
+- An engine that dies or errors while in use is discarded and a fresh one started.
+- An engine is recycled after `max_games` games, bounding memory growth and
+  any engine-side state.
+
+`map` drives every engine of the pool at once from one process (one thread
+per engine; the threads just wait on engine I/O), for workers that run with
+a single Celery process and several engines.
+"""
+
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import chess.engine
+
+from common.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _PooledEngine:
+    def __init__(self, engine: chess.engine.SimpleEngine):
+        self.engine = engine
+        self.games = 0
+
+
+class EnginePool:
+    """
+    A fixed number of UCI engines shared by the tasks of one process.
+
+    Engines start lazily, on first use, so building a pool is free.
+    """
+
+    def __init__(
+        self,
+        command: str = "stockfish",
+        size: int = 1,
+        max_games: int = 200,
+        options: Optional[dict] = None,
+    ):
+        self.command = command
+        self.size = size
+        self.max_games = max_games
+        self.options = options or {}
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)  # a slot whose engine is not started yet
+
+    def _start(self) -> _PooledEngine:
+        engine = chess.engine.SimpleEngine.popen_uci(self.command)
+        if self.options:
+            engine.configure(self.options)
+        logging.info(f"Started engine {self.command} (pid {os.getpid()})")
+        return _PooledEngine(engine)
+
+    @staticmethod
+    def _stop(pooled: _PooledEngine) -> None:
+        try:
+            pooled.engine.quit()
+        except Exception:
+            # Already dead; make sure the process is gone.
+            try:
+                pooled.engine.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _healthy(pooled: _PooledEngine) -> bool:
+        try:
+            pooled.engine.ping()
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def engine(self) -> Iterator[chess.engine.SimpleEngine]:
+        """
+        Borrows an engine for one game. Blocks until one is free.
+
+        If the body raises an engine error, the engine is assumed broken and
+        replaced; other exceptions leave it in the pool.
+        """
+        pooled = self._idle.get()
+        try:
+            if pooled is not None and not self._healthy(pooled):
+                logging.warning("Engine failed its health check; restarting it")
+                self._stop(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._start()
+        except BaseException:
+            self._idle.put(None)
+            raise
+
+        try:
+            yield pooled.engine
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError, TimeoutError):
+            logging.warning("Engine errored during analysis; restarting it")
+            self._stop(pooled)
+            pooled = None
+            raise
+        finally:
+            if pooled is not None:
+                pooled.games += 1
+                if pooled.games >= self.max_games:
+                    self._stop(pooled)
+                    pooled = None
+            self._idle.put(pooled)
+
+    def map(self, fn: Callable[[chess.engine.SimpleEngine, T], R], items: Iterable[T]) -> list[R]:
+        """Runs fn(engine, item) for every item, on all engines of the pool concurrently."""
+        def run(item):
+            with self.engine() as engine:
+                return fn(engine, item)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, items))
+
+    def close(self) -> None:
+        """Quits every idle engine. Call once no engine is borrowed."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if pooled is not None:
+                self._stop(pooled)
+
+
+_pool: Optional[EnginePool] = None
+_pool_pid: Optional[int] = None
+
+
+def get_engine_pool() -> EnginePool:
+    """
+    The engine pool of the current process, created on first use.
+
+    Keyed by pid: a pool must never cross a fork (Celery's prefork workers),
+    as the child would share the parent's engine pipes.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = EnginePool(
+            command=settings.engine_command,
+            size=settings.engine_pool_size,
+            max_games=settings.engine_max_games,
+            options={"Threads": settings.engine_threads, "Hash": settings.engine_hash_mb},
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def close_engine_pool() -> None:
+    """Quits the current process's engines, if it started any."""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
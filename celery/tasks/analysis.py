@@ -4,6 +4,8 @@ import chess
 import chess.engine
 import chess.pgn
 import io
+from celery.signals import worker_process_shutdown
+from analysis.engine_pool import get_engine_pool, close_engine_pool
 from analysis.plugins.largest_swing import LargestSwingPlugin
 from common.config import settings
 from celery_app import app, redis_client
@@ -14,6 +16,10 @@ PLUGINS = [
 ]
 
 
+@worker_process_shutdown.connect
+def _close_engines(**kwargs):
+    close_engine_pool()
+
 
 @app.task(queue='analysis_queue')
 def analyze_game(game_id: str):
@@ -53,13 +59,10 @@ def analyze_game(game_id: str):
             logging.error(f"Failed to parse PGN for game {game_id}")
             return
 
-        # 3. Initialize Engine
-        # Ensure stockfish is in the PATH (installed via apt-get)
-        engine = chess.engine.SimpleEngine.popen_uci("stockfish")
-        
+        # 3. Borrow a warm engine from this worker process's pool
         results = {}
-        
-        try:
+
+        with get_engine_pool().engine() as engine:
             # 4. Run Plugins
             for plugin in PLUGINS:
                 # Check if this plugin already ran
@@ -70,10 +73,7 @@ def analyze_game(game_id: str):
                 logging.info(f"Running plugin {plugin.name} for game {game_id}")
                 plugin_result = plugin.analyze(game, engine)
                 results[plugin.name] = plugin_result
-                
-        finally:
-            engine.quit()
-            
+
         # 5. Save Results
         if results:
             url = f"http://{settings.fastapi_route}/games/{game_id}/metrics"
@@ -119,3 +119,5 @@ class TestDataParsing:
         assert formatted["rated"] is True
         assert formatted["variant"] == "standard"
         assert formatted["clock"]["initial"] == 300
+        assert formatted["moves"] == "e4 e5"
+        assert formatted["initial_fen"] is None
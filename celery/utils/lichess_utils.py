@@ -101,6 +101,9 @@ def format_match_core(game: Dict) -> Dict:
             "increment": clock_data.get("increment", 0),
             "total_time": clock_data.get("totalTime", 0),
         },
+        # The API replays these once to store packed moves and position keys.
+        "moves": game.get("moves"),
+        "initial_fen": game.get("initialFen"),
     }
 
 def format_players(game: Dict) -> List[Dict]:
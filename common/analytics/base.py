@@ -3,11 +3,31 @@ import chess
 import chess.engine
 import chess.pgn
 
+from typing import TYPE_CHECKING
+
+from common.analytics.mainline import Mainline
+
+if TYPE_CHECKING:
+    from common.analytics.batch import GameBatch
+
 class BaseAnalytic(ABC):
     """
     Abstract base class for analysis plugins.
     Plugins are pure analysis units that take a game and return a dictionary of results.
+
+    Per-ply hooks: a plugin that sets `uses_ply_hooks = True` is driven by the
+    fused runner (common.analytics.runner), which replays each game once and
+    calls `on_ply` for every plugin at every ply instead of each plugin
+    replaying the game itself. Per-game state lives in the object returned by
+    `begin_game`, so one plugin instance can serve many games.
+
+    Batch path: a plugin that sets `supports_batch = True` implements
+    `analyze_batch` over a columnar GameBatch and is called once per batch
+    instead of once per game.
     """
+
+    uses_ply_hooks: bool = False
+    supports_batch: bool = False
     
     @property
     @abstractmethod
@@ -39,6 +59,55 @@ class BaseAnalytic(ABC):
         """
         pass
 
+    def analyze_mainline(self, mainline: Mainline) -> dict:
+        """
+        Fast path: perform analysis on the mainline moves only.
+
+        Runners always call this. The default rebuilds a Game and delegates to
+        `analyze`; plugins that only need the move sequence should override it
+        to skip building the node tree.
+
+        Args:
+            mainline: Packed mainline moves plus the starting position.
+
+        Returns:
+            A dictionary of results.
+        """
+        return self.analyze(mainline.to_game())
+
+    def analyze_batch(self, batch: "GameBatch") -> list[dict]:
+        """
+        Vectorized path: analyze every game in `batch` at once.
+        Only called when `supports_batch` is True.
+
+        Args:
+            batch: Columnar mainlines (offsets, packed moves, lazily material and clocks).
+
+        Returns:
+            One result dict per game, in batch order.
+        """
+        raise NotImplementedError
+
+    def begin_game(self, mainline: Mainline):
+        """Returns fresh per-game state for the ply hooks."""
+        return mainline
+
+    def on_ply(self, state, board: chess.Board, move: chess.Move, ply: int) -> None:
+        """
+        Called once per mainline move, in order.
+
+        Args:
+            state: The object returned by `begin_game`.
+            board: Position before `move` (shared with other plugins; do not modify).
+            move: The move played.
+            ply: 1-based ply number of `move`.
+        """
+        pass
+
+    def end_game(self, state) -> dict:
+        """Returns the results for the game. The default runs `analyze_mainline`."""
+        return self.analyze_mainline(state)
+
 class EngineAnalytic(BaseAnalytic):
     """
     Base class for analytics that require a chess engine.
@@ -57,3 +126,7 @@ class EngineAnalytic(BaseAnalytic):
             A dictionary of results.
         """
         pass
+
+    def analyze_mainline(self, mainline: Mainline, engine: chess.engine.SimpleEngine) -> dict:
+        """Fast path for engine analytics; defaults to `analyze` on a rebuilt Game."""
+        return self.analyze(mainline.to_game(), engine)
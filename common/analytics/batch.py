@@ -0,0 +1,119 @@
+"""
+Columnar game batches for vectorized analytics.
+
+A `GameBatch` holds many games' mainlines end to end in flat NumPy arrays,
+CSR style: the plies of game `i` are `offsets[i]:offsets[i + 1]` in every
+per-ply array. Move indices come straight from the packed moves; columns that
+need a board replay (material) or the PGN (clocks) are computed on first
+access and then shared by every plugin in the batch.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Optional, Sequence
+
+import chess
+import numpy as np
+
+from common.analytics.mainline import Mainline
+from common.move_encoding import MOVE_DTYPE, unpack_moves
+
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9}
+
+_CLK_RE = re.compile(r"\[%clk (\d+):(\d+):(\d+(?:\.\d+)?)\]")
+
+
+def _material(board: chess.Board, color: chess.Color) -> int:
+    return sum(
+        value * chess.popcount(board.pieces_mask(piece_type, color))
+        for piece_type, value in PIECE_VALUES.items()
+    )
+
+
+@dataclass
+class GameBatch:
+    """
+    Mainlines of many games in columnar form.
+
+    Attributes:
+        game_ids: Game ids, in batch order.
+        offsets: int64, len(game_ids) + 1. Plies of game i are offsets[i]:offsets[i+1].
+        moves: Packed moves (uint16) of all games, concatenated.
+        mainlines: The per-game Mainlines the batch was built from.
+        pgns: PGN text per game (may be None), only used for `clocks`.
+    """
+    game_ids: list[str]
+    offsets: np.ndarray
+    moves: np.ndarray
+    mainlines: list[Mainline]
+    pgns: list[Optional[str]] = field(default_factory=list)
+
+    @classmethod
+    def from_mainlines(
+        cls,
+        game_ids: Sequence[str],
+        mainlines: Sequence[Mainline],
+        pgns: Optional[Sequence[Optional[str]]] = None,
+    ) -> "GameBatch":
+        lengths = np.fromiter((len(m) for m in mainlines), dtype=np.int64, count=len(mainlines))
+        offsets = np.zeros(len(mainlines) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        moves = np.concatenate([m.moves for m in mainlines]) if mainlines else np.empty(0, dtype=MOVE_DTYPE)
+        return cls(
+            game_ids=list(game_ids),
+            offsets=offsets,
+            moves=moves.astype(MOVE_DTYPE, copy=False),
+            mainlines=list(mainlines),
+            pgns=list(pgns) if pgns is not None else [None] * len(mainlines),
+        )
+
+    def __len__(self) -> int:
+        return len(self.game_ids)
+
+    @property
+    def ply_counts(self) -> np.ndarray:
+        """Number of plies per game."""
+        return np.diff(self.offsets)
+
+    @cached_property
+    def game_index(self) -> np.ndarray:
+        """For each ply, the index of the game it belongs to."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.ply_counts)
+
+    @cached_property
+    def squares(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(from_squares, to_squares, promotions) per ply."""
+        return unpack_moves(self.moves)
+
+    @cached_property
+    def material(self) -> np.ndarray:
+        """
+        int16, shape (total plies, 2): (white, black) material in pawns after
+        each ply. Needs one board replay per game, done on first access.
+        """
+        out = np.empty((len(self.moves), 2), dtype=np.int16)
+        for i, mainline in enumerate(self.mainlines):
+            board = mainline.board()
+            row = self.offsets[i]
+            for move in mainline.iter_moves():
+                board.push(move)
+                out[row] = (_material(board, chess.WHITE), _material(board, chess.BLACK))
+                row += 1
+        return out
+
+    @cached_property
+    def clocks(self) -> np.ndarray:
+        """
+        float32 per ply: the mover's remaining clock in seconds from the PGN's
+        %clk annotations, NaN where the game has none.
+        """
+        out = np.full(len(self.moves), np.nan, dtype=np.float32)
+        for i, pgn in enumerate(self.pgns):
+            if not pgn:
+                continue
+            values = [int(h) * 3600 + int(m) * 60 + float(s) for h, m, s in _CLK_RE.findall(pgn)]
+            start, end = self.offsets[i], self.offsets[i + 1]
+            n = min(len(values), end - start)
+            out[start:start + n] = values[:n]
+        return out
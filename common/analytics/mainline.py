@@ -0,0 +1,100 @@
+"""
+Compact mainline representation for analytics.
+
+Most analytics only need the sequence of mainline moves, not the full
+`chess.pgn.Game` tree with headers, comments, clock annotations and side
+variations. A `Mainline` is just the packed move array (see
+common.move_encoding) plus the starting position. It is built straight from
+`chess.game_moves_packed` when a game has stored moves, or from the PGN with
+`read_mainline`, a visitor that skips everything but the mainline.
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import chess
+import chess.pgn
+import numpy as np
+
+from common.move_encoding import MOVE_DTYPE, as_array, decode_moves, decode_uci, encode_moves
+
+
+@dataclass(frozen=True)
+class Mainline:
+    """
+    A game's mainline.
+
+    Attributes:
+        moves: Packed moves, one uint16 per ply.
+        initial_fen: Starting position, or None for the standard start.
+        chess960: Whether castling moves are encoded king-takes-rook.
+    """
+    moves: np.ndarray
+    initial_fen: Optional[str] = None
+    chess960: bool = False
+
+    @classmethod
+    def from_packed(cls, data: bytes, initial_fen: Optional[str] = None, chess960: bool = False) -> "Mainline":
+        """Wraps a `game_moves_packed.moves` value without copying it."""
+        return cls(as_array(data), initial_fen, chess960)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def uci(self) -> list[str]:
+        return decode_uci(self.moves.tobytes())
+
+    def iter_moves(self) -> Iterator[chess.Move]:
+        return iter(decode_moves(self.moves.tobytes()))
+
+    def board(self) -> chess.Board:
+        """A fresh board at the starting position."""
+        if self.initial_fen:
+            return chess.Board(self.initial_fen, chess960=self.chess960)
+        return chess.Board(chess960=self.chess960)
+
+    def to_game(self) -> chess.pgn.Game:
+        """Builds a `chess.pgn.Game` for analytics that still need the node tree."""
+        game = chess.pgn.Game.from_board(self.board())
+        node = game
+        for move in self.iter_moves():
+            node = node.add_variation(move)
+        return game
+
+
+class MainlineVisitor(chess.pgn.BaseVisitor[Mainline]):
+    """
+    PGN visitor that keeps only the mainline moves and the starting position.
+    Headers are not stored, comments (including %clk) are ignored, and side
+    variations are skipped without parsing their SAN.
+    """
+
+    def begin_game(self) -> None:
+        self.moves: list[chess.Move] = []
+        self.start: Optional[chess.Board] = None
+
+    def visit_board(self, board: chess.Board) -> None:
+        # Called with the starting position first, then after every move.
+        if self.start is None:
+            self.start = board.copy(stack=False)
+
+    def begin_variation(self) -> chess.pgn.SkipType:
+        return chess.pgn.SKIP
+
+    def visit_move(self, board: chess.Board, move: chess.Move) -> None:
+        self.moves.append(move)
+
+    def result(self) -> Mainline:
+        start = self.start
+        initial_fen = None
+        if start is not None and start.fen() != chess.STARTING_FEN:
+            initial_fen = start.fen()
+        chess960 = bool(start is not None and start.chess960)
+        packed = as_array(encode_moves(self.moves)) if self.moves else np.empty(0, dtype=MOVE_DTYPE)
+        return Mainline(packed, initial_fen, chess960)
+
+
+def read_mainline(pgn: str) -> Optional[Mainline]:
+    """Parses the first game in `pgn` into a Mainline (None if there is no game)."""
+    return chess.pgn.read_game(io.StringIO(pgn), Visitor=MainlineVisitor)
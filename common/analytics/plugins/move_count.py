@@ -1,7 +1,11 @@
 from common.analytics.base import BaseAnalytic
+from common.analytics.batch import GameBatch
+from common.analytics.mainline import Mainline
 import chess.pgn
 
 class MoveCountAnalytic(BaseAnalytic):
+    supports_batch = True
+
     @property
     def name(self) -> str:
         return "move_count"
@@ -17,3 +21,9 @@ class MoveCountAnalytic(BaseAnalytic):
             node = node.next()
             count += 1
         return {"move_count": count}
+
+    def analyze_mainline(self, mainline: Mainline) -> dict:
+        return {"move_count": len(mainline)}
+
+    def analyze_batch(self, batch: GameBatch) -> list[dict]:
+        return [{"move_count": int(n)} for n in batch.ply_counts]
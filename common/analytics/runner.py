@@ -0,0 +1,618 @@
+"""
+Fused analytics runner.
+
+Loads a batch of games once, builds each game's Mainline once and runs every
+requested plugin over it:
+
+- Plugins with `uses_ply_hooks` share a single board replay per game; the
+  runner calls their `on_ply` hooks in turn at each ply.
+- Plugins with `supports_batch` run once over the whole batch in columnar
+  form (common.analytics.batch).
+- Other plugins get `analyze_mainline` on the same Mainline.
+
+Results are merged into `game_metrics` and one `analysis_status` row is kept
+per (game, plugin), so the per-plugin Dagster assets and the fused asset see
+the same state. A plugin failing on a game only marks that plugin failed.
+Status rows record the plugin revision that produced them; after a version
+bump `run_stale` recomputes just the stale ones, rate-limited.
+
+Execution: the analysis itself is CPU-bound and never touches the database.
+`run_pending` streams pending games in keyset order from a cursor persisted in
+`analysis_cursors`, splits them into chunks and hands them to a process pool
+(`ANALYTICS_WORKERS`, default: all cores). Finished chunks stream back, in
+completion order, to a single writer on the event loop, which owns its session
+and commits chunk by chunk along with the cursor. A run continues until it has
+covered the whole table once or its game/time budget runs out.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Literal, NamedTuple, Optional, Union
+
+from sqlalchemy import select, func, tuple_, and_, or_, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.analytics.base import BaseAnalytic
+from common.analytics.batch import GameBatch
+from common.analytics.mainline import Mainline, read_mainline
+from common.config import settings
+from common.models import Game, GameMoves, AnalysisStatus, AnalyticsType, GameMetrics, AnalysisCursor
+
+logger = logging.getLogger(__name__)
+
+PENDING_BATCH_SIZE = 1000
+
+PluginResult = Union[dict, Exception]
+
+# Keyset the pending-games scan walks: game_id alone, or (created_at, game_id).
+ScanOrder = Literal["game_id", "created_at"]
+
+
+class GameWork(NamedTuple):
+    """One pending game as shipped to a worker (picklable, no ORM state)."""
+    game_id: str
+    variant: str
+    pgn: Optional[str]
+    moves: Optional[bytes]
+    initial_fen: Optional[str]
+    todo: tuple[str, ...]  # names of the plugins still missing for this game
+
+ChunkResult = list[tuple[str, dict[str, PluginResult]]]
+
+
+def load_mainline(game_row) -> Mainline:
+    """Mainline from stored packed moves, falling back to a mainline-only PGN parse."""
+    if game_row.moves is not None:
+        return Mainline.from_packed(game_row.moves, game_row.initial_fen, chess960=game_row.variant == "chess960")
+    mainline = read_mainline(game_row.pgn or "")
+    if mainline is None:
+        raise ValueError("game has neither packed moves nor a PGN")
+    return mainline
+
+
+def run_game(plugins: Iterable[BaseAnalytic], mainline: Mainline) -> dict[str, PluginResult]:
+    """
+    Runs all plugins over one game with a single board replay.
+
+    Returns:
+        Results keyed by plugin name; a plugin that raised maps to its exception.
+    """
+    results: dict[str, PluginResult] = {}
+    hooked: list[BaseAnalytic] = []
+    states = {}
+
+    for plugin in plugins:
+        try:
+            if plugin.uses_ply_hooks:
+                states[plugin.name] = plugin.begin_game(mainline)
+                hooked.append(plugin)
+            else:
+                results[plugin.name] = plugin.analyze_mainline(mainline)
+        except Exception as e:
+            results[plugin.name] = e
+
+    if hooked:
+        board = mainline.board()
+        for ply, move in enumerate(mainline.iter_moves(), start=1):
+            for plugin in list(hooked):
+                try:
+                    plugin.on_ply(states[plugin.name], board, move, ply)
+                except Exception as e:
+                    results[plugin.name] = e
+                    hooked.remove(plugin)
+            board.push(move)
+
+        for plugin in hooked:
+            try:
+                results[plugin.name] = plugin.end_game(states[plugin.name])
+            except Exception as e:
+                results[plugin.name] = e
+
+    return results
+
+
+def run_batch_plugins(plugins: list[BaseAnalytic], games, mainlines: dict[str, Mainline]) -> dict[str, dict[str, PluginResult]]:
+    """
+    Runs the vectorized plugins once over the whole batch.
+
+    Returns:
+        {plugin name: {game_id: result}}. If a plugin raises, every game maps to the exception.
+    """
+    if not plugins:
+        return {}
+    batch = GameBatch.from_mainlines(
+        [g.game_id for g in games],
+        [mainlines[g.game_id] for g in games],
+        [g.pgn for g in games],
+    )
+    results = {}
+    for plugin in plugins:
+        try:
+            outcome = plugin.analyze_batch(batch)
+            if len(outcome) != len(batch):
+                raise ValueError(f"analyze_batch returned {len(outcome)} results for {len(batch)} games")
+        except Exception as e:
+            outcome = [e] * len(batch)
+        results[plugin.name] = dict(zip(batch.game_ids, outcome))
+    return results
+
+
+def analyze_chunk(plugins: list[BaseAnalytic], chunk: list[GameWork]) -> ChunkResult:
+    """
+    Runs the plugins each game still needs over a chunk of games. Pure CPU work.
+
+    Returns:
+        (game_id, {plugin name: result or exception}) per game, in chunk order.
+    """
+    by_name = {p.name: p for p in plugins}
+    mainlines = {}
+    load_errors = {}
+    for work in chunk:
+        try:
+            mainlines[work.game_id] = load_mainline(work)
+        except Exception as e:
+            load_errors[work.game_id] = e
+
+    batch_results = run_batch_plugins(
+        [p for p in plugins if p.supports_batch and any(p.name in w.todo for w in chunk)],
+        [w for w in chunk if w.game_id in mainlines],
+        mainlines,
+    )
+
+    out = []
+    for work in chunk:
+        todo = [by_name[name] for name in work.todo]
+        if work.game_id in load_errors:
+            results = {p.name: load_errors[work.game_id] for p in todo}
+        else:
+            results = run_game([p for p in todo if not p.supports_batch], mainlines[work.game_id])
+            for p in todo:
+                if p.supports_batch:
+                    results[p.name] = batch_results[p.name][work.game_id]
+        out.append((work.game_id, results))
+    return out
+
+
+# Plugin instances of a pool worker, installed once by the pool initializer.
+_worker_plugins: list[BaseAnalytic] = []
+
+def _init_worker(plugins: list[BaseAnalytic]) -> None:
+    global _worker_plugins
+    _worker_plugins = plugins
+
+def _analyze_in_worker(chunk: list[GameWork]) -> ChunkResult:
+    # Plugin exceptions may not pickle; ship their text instead.
+    return [
+        (game_id, {
+            name: RuntimeError(f"{type(r).__name__}: {r}") if isinstance(r, Exception) else r
+            for name, r in results.items()
+        })
+        for game_id, results in analyze_chunk(_worker_plugins, chunk)
+    ]
+
+
+class AnalyticRef(NamedTuple):
+    """A plugin's analytics_types row: what status rows are written against."""
+    id: int
+    version: Optional[str]
+    revision: int
+
+
+async def ensure_analytics(session: AsyncSession, plugins: list[BaseAnalytic]) -> dict[str, AnalyticRef]:
+    """
+    Upserts the plugins' analytics_types rows and returns them by name.
+
+    A plugin whose version string differs from the stored one gets its
+    revision bumped, which makes all of its existing results stale.
+    """
+    stmt = insert(AnalyticsType).values([
+        {"name": plugin.name, "version": plugin.version} for plugin in plugins
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={
+            "version": stmt.excluded.version,
+            "revision": case(
+                (AnalyticsType.version.is_distinct_from(stmt.excluded.version), AnalyticsType.revision + 1),
+                else_=AnalyticsType.revision,
+            ),
+        }
+    ).returning(AnalyticsType.name, AnalyticsType.id, AnalyticsType.version, AnalyticsType.revision)
+    result = await session.execute(stmt)
+    return {name: AnalyticRef(analytic_id, version, revision) for name, analytic_id, version, revision in result.all()}
+
+
+def _game_work(rows, plugins: list[BaseAnalytic], analytics: dict[str, AnalyticRef]) -> list[GameWork]:
+    """GameWork for scanned rows; `row.done` lists the analytic ids that need no work."""
+    return [
+        GameWork(
+            g.game_id, g.variant, g.pgn, g.moves, g.initial_fen,
+            tuple(p.name for p in plugins if analytics[p.name].id not in (g.done or ())),
+        )
+        for g in rows
+    ]
+
+
+def _key_columns(order: ScanOrder) -> tuple:
+    if order == "game_id":
+        return (Game.game_id,)
+    if order == "created_at":
+        return (Game.created_at, Game.game_id)
+    raise ValueError(f"Unknown scan order {order!r}; expected 'game_id' or 'created_at'")
+
+
+def _row_key(order: ScanOrder, row) -> tuple:
+    return (row.game_id,) if order == "game_id" else (row.created_at, row.game_id)
+
+
+def pending_games_query(
+    analytic_ids: list[int],
+    order: ScanOrder = "game_id",
+    after: Optional[tuple] = None,
+    upto: Optional[tuple] = None,
+    last_move_window: Optional[tuple[datetime, datetime]] = None,
+):
+    """
+    Games missing a status row for at least one of `analytic_ids`, in keyset order.
+
+    Args:
+        after: Exclusive lower bound on the key, e.g. the persisted cursor.
+        upto: Inclusive upper bound on the key (the second leg of a wrapped lap).
+        last_move_window: Only games whose last move falls in [start, end).
+
+    Each row carries the game's packed moves and `done`, the analytic ids it
+    already has a status row for (NULL if none).
+    """
+    key = _key_columns(order)
+    on_game = (
+        AnalysisStatus.game_id == Game.game_id,
+        AnalysisStatus.analytic_id.in_(analytic_ids),
+    )
+    done_count = select(func.count()).where(*on_game).scalar_subquery()
+    done_ids = select(func.array_agg(AnalysisStatus.analytic_id)).where(*on_game).scalar_subquery()
+    query = (
+        select(
+            Game.game_id, Game.created_at, Game.last_move_at, Game.variant, Game.pgn,
+            GameMoves.moves, GameMoves.initial_fen, done_ids.label("done"),
+        )
+        .outerjoin(GameMoves, GameMoves.game_id == Game.game_id)
+        .where(done_count < len(analytic_ids))
+        .order_by(*key)
+    )
+    if after is not None:
+        query = query.where(tuple_(*key) > tuple_(*after))
+    if upto is not None:
+        query = query.where(tuple_(*key) <= tuple_(*upto))
+    if last_move_window is not None:
+        start, end = last_move_window
+        query = query.where(
+            Game.last_move_at >= start,
+            Game.last_move_at < end,
+            # A game starts before its last move: prunes later partitions of games.
+            Game.created_at < end,
+        )
+    return query
+
+
+def stale_games_query(analytics: dict[str, AnalyticRef], limit: int):
+    """
+    Up to `limit` games with a status row from an older revision of one of
+    `analytics`. Driven by the (analytic_id, analytic_revision) index, so only
+    stale rows are read. `done` lists the analytic ids whose result is current.
+    """
+    def status_where(revision_check):
+        return or_(*(
+            and_(AnalysisStatus.analytic_id == a.id, revision_check(AnalysisStatus.analytic_revision, a.revision))
+            for a in analytics.values()
+        ))
+
+    stale = (
+        select(AnalysisStatus.game_id)
+        .where(status_where(lambda stored, current: stored < current))
+        .distinct()
+        .limit(limit)
+    )
+    done_ids = (
+        select(func.array_agg(AnalysisStatus.analytic_id))
+        .where(
+            AnalysisStatus.game_id == Game.game_id,
+            status_where(lambda stored, current: stored >= current),
+        )
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Game.game_id, Game.last_move_at, Game.variant, Game.pgn,
+            GameMoves.moves, GameMoves.initial_fen, done_ids.label("done"),
+        )
+        .outerjoin(GameMoves, GameMoves.game_id == Game.game_id)
+        .where(Game.game_id.in_(stale))
+    )
+
+
+async def load_cursor(session: AsyncSession, scope: str, order: ScanOrder) -> Optional[tuple]:
+    """The persisted scan key of `scope`, or None to start from the beginning."""
+    cursor = await session.get(AnalysisCursor, scope)
+    if cursor is None or cursor.last_game_id is None:
+        return None
+    if order == "game_id":
+        return (cursor.last_game_id,)
+    return (cursor.last_created_at, cursor.last_game_id)
+
+
+async def save_cursor(session: AsyncSession, scope: str, key: Optional[tuple]) -> None:
+    """Upserts the scan key of `scope` (None resets it). Does not commit."""
+    values = {
+        "scope": scope,
+        # (game_id,) or (created_at, game_id)
+        "last_created_at": key[0] if key is not None and len(key) == 2 else None,
+        "last_game_id": key[-1] if key is not None else None,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    stmt = insert(AnalysisCursor).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['scope'],
+        set_={k: stmt.excluded[k] for k in values if k != "scope"}
+    )
+    await session.execute(stmt)
+
+
+async def _write_chunk(
+    session: AsyncSession,
+    chunk_results: ChunkResult,
+    analytics: dict[str, AnalyticRef],
+    last_move_at: dict,
+    log,
+) -> None:
+    """
+    Writes one chunk's results in two statements: a metrics upsert that merges
+    into the stored JSONB (`metrics || EXCLUDED.metrics`) and a multi-row
+    status upsert. Does not commit.
+    """
+    metrics_rows = []
+    status_rows = []
+    for game_id, results in chunk_results:
+        new_metrics = {}
+        for name, outcome in results.items():
+            if isinstance(outcome, Exception):
+                log.error(f"Failed to analyze game {game_id} with {name}: {outcome}")
+                status = "failed"
+            else:
+                new_metrics[name] = outcome
+                status = "completed"
+            status_rows.append({
+                "game_id": game_id,
+                "analytic_id": analytics[name].id,
+                "status": status,
+                "updated_at": last_move_at[game_id],
+                "analytic_version": analytics[name].version,
+                "analytic_revision": analytics[name].revision,
+            })
+        if new_metrics:
+            metrics_rows.append({"game_id": game_id, "metrics": new_metrics})
+
+    if metrics_rows:
+        stmt = insert(GameMetrics).values(metrics_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['game_id'],
+            set_={'metrics': GameMetrics.metrics.concat(stmt.excluded.metrics)}
+        )
+        await session.execute(stmt)
+    if status_rows:
+        stmt = insert(AnalysisStatus).values(status_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['game_id', 'analytic_id'],
+            set_={
+                'status': stmt.excluded.status,
+                'updated_at': stmt.excluded.updated_at,
+                'analytic_version': stmt.excluded.analytic_version,
+                'analytic_revision': stmt.excluded.analytic_revision,
+            }
+        )
+        await session.execute(stmt)
+
+
+class ScanResult(NamedTuple):
+    games: int  # games processed
+    complete: bool  # False if the budget ran out before the scan covered every game
+
+
+class _ScanWriter:
+    """
+    The single writer: commits each finished chunk together with the cursor.
+
+    Chunks finish out of order, so the cursor only advances to the last key of
+    the longest run of consecutive chunks that are all written. A crash then
+    re-scans at most the chunks in flight, which are no longer pending anyway.
+    """
+
+    def __init__(self, session: AsyncSession, scope: str, analytics: dict[str, AnalyticRef], log):
+        self.session = session
+        self.scope = scope
+        self.analytics = analytics
+        self.log = log
+        self._next_seq = 0
+        self._finished: dict[int, tuple] = {}
+
+    async def write(self, seq: int, chunk_results: ChunkResult, last_move_at: dict, last_key: tuple) -> None:
+        await _write_chunk(self.session, chunk_results, self.analytics, last_move_at, self.log)
+        self._finished[seq] = last_key
+        key = None
+        while self._next_seq in self._finished:
+            key = self._finished.pop(self._next_seq)
+            self._next_seq += 1
+        if key is not None:
+            await save_cursor(self.session, self.scope, key)
+        await self.session.commit()
+
+    async def reset(self) -> None:
+        await save_cursor(self.session, self.scope, None)
+        await self.session.commit()
+
+
+async def run_pending(
+    session_factory: Callable[[], AsyncSession],
+    plugins: list[BaseAnalytic],
+    scope: str,
+    order: ScanOrder = "game_id",
+    batch_size: int = PENDING_BATCH_SIZE,
+    max_games: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    last_move_window: Optional[tuple[datetime, datetime]] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    log=logger,
+) -> ScanResult:
+    """
+    Analyzes pending games with all `plugins`, resuming from the scope's cursor.
+
+    The scan walks games in `order` from the persisted cursor to the end, then
+    wraps around to the start and stops where it began, so one run can cover
+    the whole table. It stops early when `max_games` or `max_seconds` runs out;
+    the next run picks up where this one stopped.
+
+    Args:
+        session_factory: Opens sessions; the scan streams on one while the
+            writer commits on another.
+        scope: Name the cursor is kept under (combined with `order`); give
+            each partition of a partitioned asset its own.
+        batch_size: Rows fetched per round trip of the streamed scan.
+        last_move_window: Restricts the scan to games whose last move falls in
+            [start, end), e.g. one month partition.
+        workers: Worker processes; None reads ANALYTICS_WORKERS (0 = all cores).
+            With 1 the chunks run inline.
+        chunk_size: Games per chunk; None reads ANALYTICS_CHUNK_SIZE.
+
+    Returns:
+        Number of games processed, and whether the scan covered every game.
+    """
+    _key_columns(order)
+    scope = f"{scope}:{order}"
+    workers = settings.analytics_workers if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.analytics_chunk_size
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+
+    async with session_factory() as session:
+        analytics = await ensure_analytics(session, plugins)
+        start = await load_cursor(session, scope, order)
+        await session.commit()
+    ids = [a.id for a in analytics.values()]
+    laps = [(start, None), (None, start)] if start is not None else [(None, None)]
+    log.info(f"Scanning pending games for {', '.join(p.name for p in plugins)} from {start or 'the start'}")
+
+    # spawn, not fork: the parent holds an event loop and open DB connections.
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(plugins,),
+    ) if workers > 1 else None
+    loop = asyncio.get_running_loop()
+    inflight: dict[asyncio.Future, tuple] = {}
+    games = 0
+    seq = 0
+    completed_lap = True
+
+    try:
+        async with session_factory() as reader, session_factory() as write_session:
+            writer = _ScanWriter(write_session, scope, analytics, log)
+
+            async def drain(below: int) -> None:
+                while len(inflight) > below:
+                    finished, _ = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                    for future in finished:
+                        chunk_seq, last_move_at, last_key = inflight.pop(future)
+                        await writer.write(chunk_seq, future.result(), last_move_at, last_key)
+
+            for after, upto in laps:
+                stmt = pending_games_query(ids, order, after, upto, last_move_window).execution_options(yield_per=batch_size)
+                result = await reader.stream(stmt)
+                try:
+                    async for rows in result.partitions(chunk_size):
+                        if max_games is not None:
+                            rows = rows[:max_games - games]
+                        if not rows or (deadline is not None and time.monotonic() >= deadline):
+                            completed_lap = False
+                            break
+                        work = _game_work(rows, plugins, analytics)
+                        last_move_at = {g.game_id: g.last_move_at for g in rows}
+                        last_key = _row_key(order, rows[-1])
+                        games += len(rows)
+                        if pool is None:
+                            await writer.write(seq, analyze_chunk(plugins, work), last_move_at, last_key)
+                        else:
+                            future = loop.run_in_executor(pool, _analyze_in_worker, work)
+                            inflight[future] = (seq, last_move_at, last_key)
+                            # Bounded read-ahead: the scan never gets far ahead of the writer.
+                            await drain(2 * workers - 1)
+                        seq += 1
+                finally:
+                    await result.close()
+                if not completed_lap:
+                    break
+            await drain(0)
+
+            if completed_lap:
+                await writer.reset()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    log.info(f"Analyzed {games} games" + ("" if completed_lap else " (budget reached, will resume from cursor)"))
+    return ScanResult(games, completed_lap)
+
+
+async def run_stale(
+    session_factory: Callable[[], AsyncSession],
+    plugins: list[BaseAnalytic],
+    max_games: Optional[int] = None,
+    games_per_second: Optional[float] = None,
+    chunk_size: Optional[int] = None,
+    log=logger,
+) -> ScanResult:
+    """
+    Re-analyzes games whose results came from an older version of one of
+    `plugins`, recomputing only the stale plugins of each game.
+
+    Rewritten rows carry the current revision, so each round simply takes the
+    next stale games; no cursor is needed. Runs inline and sleeps between
+    chunks to stay under `games_per_second`, so a version bump does not swamp
+    the database.
+
+    Returns:
+        Number of games re-analyzed, and whether no stale games are left.
+    """
+    chunk_size = chunk_size or settings.analytics_chunk_size
+    started = time.monotonic()
+    games = 0
+    async with session_factory() as session:
+        analytics = await ensure_analytics(session, plugins)
+        await session.commit()
+
+        while max_games is None or games < max_games:
+            limit = chunk_size if max_games is None else min(chunk_size, max_games - games)
+            rows = (await session.execute(stale_games_query(analytics, limit))).all()
+            if not rows:
+                log.info(f"Re-analyzed {games} games; no stale results left")
+                return ScanResult(games, True)
+
+            work = _game_work(rows, plugins, analytics)
+            last_move_at = {g.game_id: g.last_move_at for g in rows}
+            await _write_chunk(session, analyze_chunk(plugins, work), analytics, last_move_at, log)
+            await session.commit()
+            games += len(rows)
+
+            if games_per_second:
+                delay = games / games_per_second - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+    log.info(f"Re-analyzed {games} games (limit reached)")
+    return ScanResult(games, False)
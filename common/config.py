@@ -15,6 +15,17 @@ class Settings(BaseSettings):
     fastapi_route: str = Field("", validation_alias="FASTAPI_ROUTE")
     celery_broker_url: str = Field("", validation_alias="CELERY_BROKER_URL")
 
+    # Analytics runner (Dagster)
+    analytics_workers: int = Field(0, validation_alias="ANALYTICS_WORKERS")  # 0 = all cores
+    analytics_chunk_size: int = Field(100, validation_alias="ANALYTICS_CHUNK_SIZE")
+
+    # Stockfish engine pool (Celery analysis workers)
+    engine_command: str = Field("stockfish", validation_alias="ENGINE_COMMAND")
+    engine_pool_size: int = Field(1, validation_alias="ENGINE_POOL_SIZE")  # engines per worker process
+    engine_max_games: int = Field(200, validation_alias="ENGINE_MAX_GAMES")  # recycle an engine after this many games
+    engine_threads: int = Field(1, validation_alias="ENGINE_THREADS")
+    engine_hash_mb: int = Field(64, validation_alias="ENGINE_HASH_MB")
+
     @property
     def database_url(self) -> str:
         return f"postgresql+psycopg://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
@@ -0,0 +1,60 @@
+"""add player stats
+
+Revision ID: 7c1bc602579c
+Revises: f61f47fb2876
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1bc602579c'
+down_revision: Union[str, None] = 'f61f47fb2876'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('player_stats',
+    sa.Column('player_id', sa.Text(), nullable=False),
+    sa.Column('perf', sa.String(length=50), nullable=False),
+    sa.Column('games', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('wins', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('draws', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('losses', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('last_rating', sa.Integer(), nullable=True),
+    sa.Column('peak_rating', sa.Integer(), nullable=True),
+    sa.Column('last_game_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['player_id'], ['chess.players.player_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('player_id', 'perf'),
+    schema='chess'
+    )
+
+    # Backfill from the existing links. Unfinished games are not counted,
+    # matching crud.UNSCORED_STATUSES.
+    op.execute("""
+        INSERT INTO chess.player_stats
+            (player_id, perf, games, wins, draws, losses, last_rating, peak_rating, last_game_at)
+        SELECT
+            gp.player_id,
+            g.perf,
+            count(*),
+            count(*) FILTER (WHERE g.winner = gp.color),
+            count(*) FILTER (WHERE g.winner IS NULL),
+            count(*) FILTER (WHERE g.winner IS NOT NULL AND g.winner <> gp.color),
+            (array_agg(NULLIF(gp.rating, 0) ORDER BY g.last_move_at DESC))[1],
+            max(NULLIF(gp.rating, 0)),
+            max(g.last_move_at)
+        FROM chess.game_players gp
+        JOIN chess.games g ON g.game_id = gp.game_id
+        WHERE g.status NOT IN ('created', 'started', 'aborted', 'noStart', 'unknownFinish')
+        GROUP BY gp.player_id, g.perf
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('player_stats', schema='chess')
@@ -0,0 +1,228 @@
+"""partition games and game_players by month
+
+Revision ID: 9d761bfb9d29
+Revises: 7c1bc602579c
+Create Date: 2026-10-19 11:00:00.000000
+
+Online path: the existing heap tables are not copied. Instead they become a
+single "legacy" partition covering everything before the current month's end,
+attached to new partitioned parents. The expensive steps (CHECK validation,
+unique index builds, backfilling game_players.created_at) run in autocommit
+mode with non-blocking locks; only the final rename/attach swap takes an
+exclusive lock, and it is catalog-only: the validated CHECK constraints let
+ATTACH skip its scan and the pre-built unique indexes become the partitions'
+primary keys.
+
+New months get their own partitions through chess.ensure_game_partitions(),
+which the API calls on ingest. chess.detach_game_month() detaches a whole
+month from both tables for archival.
+
+Foreign keys that pointed at games.game_id are dropped: a FK into a
+partitioned table must include the partition key, which the dependent tables
+do not carry.
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d761bfb9d29'
+down_revision: Union[str, None] = '7c1bc602579c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Number of months to pre-create after the legacy partition.
+MONTHS_AHEAD = 3
+BACKFILL_BATCH_SIZE = 10000
+
+DEPENDENT_FKS = [
+    ('game_moves', 'game_moves_game_id_fkey'),
+    ('analysis_status', 'analysis_status_game_id_fkey'),
+    ('game_players', 'game_players_game_id_fkey'),
+]
+
+
+def _legacy_boundary() -> str:
+    """First instant of next month (UTC); everything before it stays in the legacy partition."""
+    now = datetime.now(timezone.utc)
+    year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+    return datetime(year, month, 1, tzinfo=timezone.utc).isoformat()
+
+
+FILL_CREATED_AT_FN = """
+CREATE OR REPLACE FUNCTION chess.game_players_fill_created_at()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.created_at IS NULL THEN
+        SELECT created_at INTO NEW.created_at FROM chess.games WHERE game_id = NEW.game_id;
+    END IF;
+    RETURN NEW;
+END
+$$;
+"""
+
+ENSURE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION chess.ensure_game_partitions(from_ts timestamptz, to_ts timestamptz)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_ts AT TIME ZONE 'UTC');
+    month_end timestamp;
+    parent text;
+    part text;
+    created integer := 0;
+BEGIN
+    -- Concurrent ingest workers may ask for the same month at once.
+    PERFORM pg_advisory_xact_lock(hashtext('chess.ensure_game_partitions'));
+
+    WHILE month_start <= to_ts AT TIME ZONE 'UTC' LOOP
+        month_end := month_start + interval '1 month';
+        FOREACH parent IN ARRAY ARRAY['games', 'game_players'] LOOP
+            part := parent || '_p' || to_char(month_start, 'YYYY_MM');
+            CONTINUE WHEN to_regclass(format('chess.%I', part)) IS NOT NULL;
+            BEGIN
+                -- CREATE + ATTACH only takes SHARE UPDATE EXCLUSIVE on the parent,
+                -- unlike CREATE TABLE ... PARTITION OF.
+                EXECUTE format(
+                    'CREATE TABLE chess.%I (LIKE chess.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    part, parent
+                );
+                EXECUTE format(
+                    'ALTER TABLE chess.%I ATTACH PARTITION chess.%I FOR VALUES FROM (%L) TO (%L)',
+                    parent, part, month_start AT TIME ZONE 'UTC', month_end AT TIME ZONE 'UTC'
+                );
+                created := created + 1;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- Month already covered by another partition (games_legacy).
+                NULL;
+            END;
+        END LOOP;
+        month_start := month_end;
+    END LOOP;
+
+    RETURN created;
+END
+$$;
+"""
+
+DETACH_MONTH_FN = """
+CREATE OR REPLACE FUNCTION chess.detach_game_month(month date)
+RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    parent text;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['game_players', 'games'] LOOP
+        EXECUTE format(
+            'ALTER TABLE chess.%I DETACH PARTITION chess.%I',
+            parent, parent || '_p' || to_char(month, 'YYYY_MM')
+        );
+    END LOOP;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    boundary = _legacy_boundary()
+    conn = op.get_bind()
+
+    with op.get_context().autocommit_block():
+        # 1. Prove the legacy range without blocking writers (VALIDATE only
+        #    takes SHARE UPDATE EXCLUSIVE), so ATTACH can skip its scan later.
+        op.execute(f"ALTER TABLE chess.games ADD CONSTRAINT games_legacy_range CHECK (created_at < '{boundary}') NOT VALID")
+        op.execute("ALTER TABLE chess.games VALIDATE CONSTRAINT games_legacy_range")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS games_legacy_game_id_created_at ON chess.games (game_id, created_at)")
+
+        # 2. game_players needs the partition key. Add it (no rewrite), let a
+        #    trigger fill it for links written by the old code meanwhile, and
+        #    backfill existing rows in short transactions.
+        op.execute("ALTER TABLE chess.game_players ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE")
+        op.execute(FILL_CREATED_AT_FN)
+        op.execute("""
+            CREATE TRIGGER game_players_fill_created_at BEFORE INSERT ON chess.game_players
+            FOR EACH ROW EXECUTE FUNCTION chess.game_players_fill_created_at()
+        """)
+        op.execute(f"""
+            ALTER TABLE chess.game_players ADD CONSTRAINT game_players_legacy_range
+            CHECK (created_at IS NOT NULL AND created_at < '{boundary}') NOT VALID
+        """)
+        while True:
+            result = conn.execute(sa.text("""
+                UPDATE chess.game_players gp SET created_at = g.created_at
+                FROM chess.games g
+                WHERE gp.ctid IN (
+                    SELECT ctid FROM chess.game_players WHERE created_at IS NULL LIMIT :batch
+                ) AND g.game_id = gp.game_id
+            """), {"batch": BACKFILL_BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+        op.execute("ALTER TABLE chess.game_players VALIDATE CONSTRAINT game_players_legacy_range")
+        # Uses the validated CHECK instead of scanning.
+        op.execute("ALTER TABLE chess.game_players ALTER COLUMN created_at SET NOT NULL")
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS game_players_legacy_key ON chess.game_players (game_id, player_id, created_at)")
+
+    # 3. Swap. Everything below only touches the catalog.
+    op.execute("DROP TRIGGER game_players_fill_created_at ON chess.game_players")
+    op.execute("DROP FUNCTION chess.game_players_fill_created_at()")
+
+    for table, fk in DEPENDENT_FKS:
+        op.drop_constraint(fk, table, schema='chess', type_='foreignkey')
+
+    # ATTACH only adopts an existing index for the parent's primary key if it
+    # already backs a constraint, so promote the indexes built above.
+    op.execute("ALTER TABLE chess.games DROP CONSTRAINT games_pkey")
+    op.execute("ALTER TABLE chess.games ADD CONSTRAINT games_legacy_pkey PRIMARY KEY USING INDEX games_legacy_game_id_created_at")
+    op.execute("ALTER TABLE chess.games RENAME TO games_legacy")
+    op.execute("ALTER TABLE chess.game_players DROP CONSTRAINT game_players_pkey")
+    op.execute("ALTER TABLE chess.game_players ADD CONSTRAINT game_players_legacy_pkey PRIMARY KEY USING INDEX game_players_legacy_key")
+    op.execute("ALTER TABLE chess.game_players RENAME TO game_players_legacy")
+
+    op.execute("CREATE TABLE chess.games (LIKE chess.games_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE chess.games ADD CONSTRAINT games_pkey PRIMARY KEY (game_id, created_at)")
+    op.execute(f"ALTER TABLE chess.games ATTACH PARTITION chess.games_legacy FOR VALUES FROM (MINVALUE) TO ('{boundary}')")
+
+    op.execute("CREATE TABLE chess.game_players (LIKE chess.game_players_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE chess.game_players ADD CONSTRAINT game_players_pkey PRIMARY KEY (game_id, player_id, created_at)")
+    op.execute("""
+        ALTER TABLE chess.game_players ADD CONSTRAINT game_players_player_id_fkey
+        FOREIGN KEY (player_id) REFERENCES chess.players (player_id) ON DELETE CASCADE
+    """)
+    op.execute(f"ALTER TABLE chess.game_players ATTACH PARTITION chess.game_players_legacy FOR VALUES FROM (MINVALUE) TO ('{boundary}')")
+
+    # The partition bounds now imply these.
+    op.execute("ALTER TABLE chess.games_legacy DROP CONSTRAINT games_legacy_range")
+    op.execute("ALTER TABLE chess.game_players_legacy DROP CONSTRAINT game_players_legacy_range")
+
+    op.execute(ENSURE_PARTITIONS_FN)
+    op.execute(DETACH_MONTH_FN)
+    op.execute(f"SELECT chess.ensure_game_partitions('{boundary}', '{boundary}'::timestamptz + interval '{MONTHS_AHEAD} months')")
+
+
+def downgrade() -> None:
+    # Collapse back into plain heap tables. This copies the data and is not online.
+    op.execute("DROP FUNCTION IF EXISTS chess.detach_game_month(date)")
+    op.execute("DROP FUNCTION IF EXISTS chess.ensure_game_partitions(timestamptz, timestamptz)")
+
+    op.execute("CREATE TABLE chess.games_plain (LIKE chess.games INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO chess.games_plain SELECT * FROM chess.games")
+    op.execute("CREATE TABLE chess.game_players_plain (LIKE chess.game_players INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO chess.game_players_plain SELECT * FROM chess.game_players")
+    op.execute("DROP TABLE chess.game_players")
+    op.execute("DROP TABLE chess.games")
+
+    op.execute("ALTER TABLE chess.games_plain RENAME TO games")
+    op.execute("ALTER TABLE chess.games ADD CONSTRAINT games_pkey PRIMARY KEY (game_id)")
+    op.execute("ALTER TABLE chess.game_players_plain RENAME TO game_players")
+    op.execute("ALTER TABLE chess.game_players DROP COLUMN created_at")
+    op.execute("ALTER TABLE chess.game_players ADD CONSTRAINT game_players_pkey PRIMARY KEY (game_id, player_id)")
+    op.create_foreign_key('game_players_player_id_fkey', 'game_players', 'players', ['player_id'], ['player_id'],
+                          source_schema='chess', referent_schema='chess', ondelete='CASCADE')
+
+    for table, fk in DEPENDENT_FKS:
+        op.create_foreign_key(fk, table, 'games', ['game_id'], ['game_id'],
+                              source_schema='chess', referent_schema='chess', ondelete='CASCADE')
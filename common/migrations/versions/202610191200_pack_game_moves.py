@@ -0,0 +1,94 @@
+"""pack game moves into one bytea per game
+
+Revision ID: 6919db0aec3b
+Revises: 9d761bfb9d29
+Create Date: 2026-10-19 12:00:00.000000
+
+Replaces chess.game_moves (one row per ply) with chess.game_moves_packed
+(one row per game, uint16 per ply, see common.move_encoding). Existing rows
+are converted by replaying their SAN from the standard start position; games
+whose moves do not replay are skipped and reported.
+"""
+import itertools
+from typing import Sequence, Union
+
+from alembic import op
+import chess
+import sqlalchemy as sa
+
+from common.move_encoding import decode_san, encode_moves
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6919db0aec3b'
+down_revision: Union[str, None] = '9d761bfb9d29'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INSERT_BATCH_SIZE = 1000
+
+
+def _flush(conn, table, rows):
+    if rows:
+        conn.execute(table.insert(), rows)
+        rows.clear()
+
+
+def upgrade() -> None:
+    packed = op.create_table('game_moves_packed',
+    sa.Column('game_id', sa.String(length=255), nullable=False),
+    sa.Column('initial_fen', sa.Text(), nullable=True),
+    sa.Column('ply_count', sa.SmallInteger(), nullable=False),
+    sa.Column('moves', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('game_id'),
+    schema='chess'
+    )
+
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT game_id, move FROM chess.game_moves ORDER BY game_id, move_number"
+    ).execution_options(stream_results=True))
+    batch = []
+    for game_id, rows in itertools.groupby(result, key=lambda row: row.game_id):
+        board = chess.Board()
+        try:
+            moves = [board.push_san(row.move) for row in rows]
+        except ValueError as e:
+            print(f"Skipping moves for game {game_id}: {e}")
+            continue
+        batch.append({
+            'game_id': game_id,
+            'initial_fen': None,
+            'ply_count': len(moves),
+            'moves': encode_moves(moves),
+        })
+        if len(batch) >= INSERT_BATCH_SIZE:
+            _flush(conn, packed, batch)
+    _flush(conn, packed, batch)
+
+    op.drop_table('game_moves', schema='chess')
+
+
+def downgrade() -> None:
+    moves = op.create_table('game_moves',
+    sa.Column('id', sa.BigInteger(), nullable=False, autoincrement=True),
+    sa.Column('game_id', sa.String(length=255), nullable=False),
+    sa.Column('move_number', sa.Integer(), nullable=False),
+    sa.Column('move', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    schema='chess'
+    )
+
+    conn = op.get_bind()
+    result = conn.execute(sa.text(
+        "SELECT game_id, initial_fen, moves FROM chess.game_moves_packed"
+    ).execution_options(stream_results=True))
+    batch = []
+    for row in result:
+        for move_number, san in enumerate(decode_san(row.moves, row.initial_fen), start=1):
+            batch.append({'game_id': row.game_id, 'move_number': move_number, 'move': san})
+        if len(batch) >= INSERT_BATCH_SIZE:
+            _flush(conn, moves, batch)
+    _flush(conn, moves, batch)
+
+    op.drop_table('game_moves_packed', schema='chess')
@@ -0,0 +1,62 @@
+"""add game_positions zobrist index
+
+Revision ID: 15f88c4f6b27
+Revises: 6919db0aec3b
+Create Date: 2026-10-19 13:00:00.000000
+
+One (zobrist, game_id, ply) row per position reached. Existing games are
+backfilled by replaying their packed moves.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from common.move_encoding import decode_moves
+from common.positions import replay_keys
+
+
+# revision identifiers, used by Alembic.
+revision: str = '15f88c4f6b27'
+down_revision: Union[str, None] = '6919db0aec3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INSERT_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    positions = op.create_table('game_positions',
+    sa.Column('zobrist', sa.BigInteger(), nullable=False),
+    sa.Column('game_id', sa.String(length=255), nullable=False),
+    sa.Column('ply', sa.SmallInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('zobrist', 'game_id', 'ply'),
+    schema='chess'
+    )
+
+    conn = op.get_bind()
+    result = conn.execute(sa.text("""
+        SELECT m.game_id, m.initial_fen, m.moves, g.variant
+        FROM chess.game_moves_packed m
+        LEFT JOIN chess.games g ON g.game_id = m.game_id
+    """).execution_options(stream_results=True))
+    batch = []
+    for row in result:
+        try:
+            keys = replay_keys(decode_moves(row.moves), row.initial_fen, chess960=row.variant == 'chess960')
+        except (ValueError, AssertionError) as e:
+            print(f"Skipping positions for game {row.game_id}: {e}")
+            continue
+        batch.extend(
+            {'zobrist': key, 'game_id': row.game_id, 'ply': ply}
+            for ply, key in enumerate(keys, start=1)
+        )
+        if len(batch) >= INSERT_BATCH_SIZE:
+            conn.execute(positions.insert(), batch)
+            batch.clear()
+    if batch:
+        conn.execute(positions.insert(), batch)
+
+
+def downgrade() -> None:
+    op.drop_table('game_positions', schema='chess')
@@ -0,0 +1,80 @@
+"""add eco opening columns to games
+
+Revision ID: 7f1954fe93c5
+Revises: 15f88c4f6b27
+Create Date: 2026-10-19 14:00:00.000000
+
+Adds games.eco / games.opening_name, classifies existing games from their
+packed moves, and indexes eco. The index is created on the partitioned parent
+only, built CONCURRENTLY on each partition and then attached, so writers are
+not blocked; partitions created later inherit it on ATTACH.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from common.move_encoding import decode_uci
+from common.openings import classify
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f1954fe93c5'
+down_revision: Union[str, None] = '15f88c4f6b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPDATE_BATCH_SIZE = 1000
+# Moves past the longest line in the table cannot change the classification.
+OPENING_PLIES = 40
+
+
+def _partitions(conn) -> list[str]:
+    return list(conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'chess.games'::regclass
+    """)).scalars())
+
+
+def upgrade() -> None:
+    op.add_column('games', sa.Column('eco', sa.String(length=3), nullable=True), schema='chess')
+    op.add_column('games', sa.Column('opening_name', sa.Text(), nullable=True), schema='chess')
+
+    conn = op.get_bind()
+    result = conn.execute(sa.text("""
+        SELECT g.game_id, g.created_at, m.moves
+        FROM chess.game_moves_packed m
+        JOIN chess.games g ON g.game_id = m.game_id
+        WHERE m.initial_fen IS NULL AND g.variant = 'standard'
+    """).execution_options(stream_results=True))
+    update = sa.text("""
+        UPDATE chess.games SET eco = :eco, opening_name = :opening_name
+        WHERE game_id = :game_id AND created_at = :created_at
+    """)
+    batch = []
+    for row in result:
+        opening = classify(decode_uci(row.moves[:2 * OPENING_PLIES]))
+        if opening is None:
+            continue
+        batch.append({'game_id': row.game_id, 'created_at': row.created_at,
+                      'eco': opening[0], 'opening_name': opening[1]})
+        if len(batch) >= UPDATE_BATCH_SIZE:
+            conn.execute(update, batch)
+            batch.clear()
+    if batch:
+        conn.execute(update, batch)
+
+    op.execute("CREATE INDEX ix_games_eco ON ONLY chess.games (eco)")
+    partitions = _partitions(conn)
+    with op.get_context().autocommit_block():
+        for part in partitions:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{part}_eco ON chess.{part} (eco)")
+    for part in partitions:
+        op.execute(f"ALTER INDEX chess.ix_games_eco ATTACH PARTITION chess.ix_{part}_eco")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_games_eco', table_name='games', schema='chess')
+    op.drop_column('games', 'opening_name', schema='chess')
+    op.drop_column('games', 'eco', schema='chess')
@@ -0,0 +1,60 @@
+"""add analysis cursors and games keyset index
+
+Revision ID: 3b8e0d52a4c1
+Revises: 7f1954fe93c5
+Create Date: 2026-10-19 15:00:00.000000
+
+Adds chess.analysis_cursors, where each analytics asset persists the keyset
+position of its pending-games scan, and an index on games (created_at, game_id)
+so the scan can also walk games in creation order. As with ix_games_eco, the
+index is created on the partitioned parent only, built CONCURRENTLY on each
+partition and then attached.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e0d52a4c1'
+down_revision: Union[str, None] = '7f1954fe93c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partitions(conn) -> list[str]:
+    return list(conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'chess.games'::regclass
+    """)).scalars())
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analysis_cursors',
+        sa.Column('scope', sa.String(length=255), nullable=False),
+        sa.Column('last_created_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('last_game_id', sa.String(length=255), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('scope'),
+        schema='chess'
+    )
+
+    conn = op.get_bind()
+    op.execute("CREATE INDEX ix_games_created_at_game_id ON ONLY chess.games (created_at, game_id)")
+    partitions = _partitions(conn)
+    with op.get_context().autocommit_block():
+        for part in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{part}_created_at_game_id "
+                f"ON chess.{part} (created_at, game_id)"
+            )
+    for part in partitions:
+        op.execute(f"ALTER INDEX chess.ix_games_created_at_game_id ATTACH PARTITION chess.ix_{part}_created_at_game_id")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_games_created_at_game_id', table_name='games', schema='chess')
+    op.drop_table('analysis_cursors', schema='chess')
@@ -0,0 +1,42 @@
+"""record analytic version on analysis status rows
+
+Revision ID: c42d7a9e1f06
+Revises: 3b8e0d52a4c1
+Create Date: 2026-10-19 16:00:00.000000
+
+Adds analytics_types.revision, bumped whenever a plugin's version string
+changes, and analysis_status.analytic_version / analytic_revision, recording
+which version produced each result. Existing rows are taken to be current
+(revision 1); the constant defaults avoid a table rewrite. Stale rows are
+found through an (analytic_id, analytic_revision) index, built CONCURRENTLY.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c42d7a9e1f06'
+down_revision: Union[str, None] = '3b8e0d52a4c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('analytics_types', sa.Column('revision', sa.Integer(), server_default='1', nullable=False), schema='chess')
+    op.add_column('analysis_status', sa.Column('analytic_version', sa.String(length=50), nullable=True), schema='chess')
+    op.add_column('analysis_status', sa.Column('analytic_revision', sa.Integer(), server_default='1', nullable=False), schema='chess')
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_analysis_status_analytic_revision', 'analysis_status', ['analytic_id', 'analytic_revision'],
+            schema='chess', postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_status_analytic_revision', table_name='analysis_status', schema='chess')
+    op.drop_column('analysis_status', 'analytic_revision', schema='chess')
+    op.drop_column('analysis_status', 'analytic_version', schema='chess')
+    op.drop_column('analytics_types', 'revision', schema='chess')
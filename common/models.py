@@ -4,14 +4,23 @@ SQLAlchemy Models for the Chess Data Application.
 This module defines the database schema using SQLAlchemy ORM.
 It maps Python classes to PostgreSQL tables in the 'chess' schema.
 
+Partitioning: `games` and `game_players` are partitioned by month of
+`created_at` (see migration 9d761bfb9d29). Foreign keys into a partitioned
+table must include the partition key, so tables keyed by game_id alone
+(moves, metrics, analysis status) reference games by convention only.
+
 Key Models:
 - Player: Stores player information (ID, name, fetch status).
-- Game: Stores game metadata (ID, PGN, status, time control).
-- GameMove: Stores individual moves for a game (one row per move).
+- Game: Stores game metadata (ID, PGN, status, time control, opening). Range-partitioned by month of created_at.
+- GameMoves: Stores a game's moves packed into one bytea (one row per game).
+- GamePosition: Zobrist key of every position reached in a game, for position search.
 - GamePlayer: Link table between Games and Players (many-to-many), storing color and rating.
+  Partitioned like Game, so it carries the game's created_at.
+- PlayerStats: Incrementally maintained per-player, per-perf aggregates (record, ratings).
+- AnalysisCursor: Where the analytics scan of pending games left off, per asset.
 """
 
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, Text, TIMESTAMP, PrimaryKeyConstraint, Numeric, Index
+from sqlalchemy import Column, String, Integer, SmallInteger, BigInteger, LargeBinary, Boolean, ForeignKey, Text, TIMESTAMP, PrimaryKeyConstraint, Numeric, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
 
@@ -42,12 +51,12 @@ class Game(Base):
     Represents a Chess Game.
     
     Attributes:
-        game_id (String): Unique Lichess game ID. Primary Key.
+        game_id (String): Unique Lichess game ID. Primary Key (with created_at).
         rated (Boolean): Whether the game was rated.
         variant (String): Game variant (standard, blitz, etc.).
         speed (String): Game speed category (bullet, blitz, rapid, classical).
         perf (String): Performance rating category.
-        created_at (TIMESTAMP): Game start time.
+        created_at (TIMESTAMP): Game start time. Partition key.
         last_move_at (TIMESTAMP): Game end time (or last move time).
         status (String): Game status (mate, resign, draw, etc.).
         winner (String): 'white', 'black', or None (draw).
@@ -55,16 +64,22 @@ class Game(Base):
         clock_initial (Integer): Initial clock time in seconds.
         clock_increment (Integer): Clock increment in seconds.
         clock_total_time (Integer): Total estimated game time.
+        eco (String): ECO code of the opening, classified at ingest (see common.openings).
+        opening_name (Text): Opening name matching `eco`.
     """
     __tablename__ = 'games'
-    __table_args__ = {'schema': 'chess'}
+    __table_args__ = (
+        Index('ix_games_eco', 'eco'),
+        Index('ix_games_created_at_game_id', 'created_at', 'game_id'),
+        {'schema': 'chess', 'postgresql_partition_by': 'RANGE (created_at)'},
+    )
     
     game_id = Column(String(255), primary_key=True)
     rated = Column(Boolean, nullable=False)
     variant = Column(String(50), nullable=False)
     speed = Column(String(50), nullable=False)
     perf = Column(String(50), nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True)
     last_move_at = Column(TIMESTAMP(timezone=True), nullable=False)
     status = Column(String(50), nullable=False)
     source = Column(String(50))
@@ -73,48 +88,108 @@ class Game(Base):
     clock_initial = Column(Integer)
     clock_increment = Column(Integer)
     clock_total_time = Column(Integer)
+    eco = Column(String(3))
+    opening_name = Column(Text)
 
-class GameMove(Base):
+class GameMoves(Base):
     """
-    Represents a single move in a game.
+    Stores a game's mainline as one packed binary value.
     
     Attributes:
-        id (Integer): Auto-incrementing primary key.
-        game_id (String): Foreign Key to games.game_id.
-        move_number (Integer): The move number (1, 2, 3...).
-        move (Text): The move in SAN (Standard Algebraic Notation), e.g., "e4".
+        game_id (String): References games.game_id. Primary Key.
+        initial_fen (Text): Starting position, or None for the standard start.
+        ply_count (Integer): Number of plies in `moves`.
+        moves (LargeBinary): One little-endian uint16 per ply (see common.move_encoding).
     """
-    __tablename__ = 'game_moves'
+    __tablename__ = 'game_moves_packed'
     __table_args__ = {'schema': 'chess'}
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    game_id = Column(String(255), ForeignKey('chess.games.game_id', ondelete='CASCADE'), nullable=False)
-    move_number = Column(Integer, nullable=False)
-    move = Column(Text, nullable=False)
+    game_id = Column(String(255), primary_key=True)
+    initial_fen = Column(Text)
+    ply_count = Column(SmallInteger, nullable=False)
+    moves = Column(LargeBinary, nullable=False)
+
+class GamePosition(Base):
+    """
+    Index of positions reached in games, one row per ply.
+
+    The primary key leads with the key so "games that reached this position"
+    is a single btree range scan.
+
+    Attributes:
+        zobrist (BigInteger): Signed 64-bit Zobrist hash of the position (see common.positions).
+        game_id (String): References games.game_id.
+        ply (SmallInteger): Ply after which the position arose (1 = after White's first move).
+    """
+    __tablename__ = 'game_positions'
+    __table_args__ = (
+        PrimaryKeyConstraint('zobrist', 'game_id', 'ply'),
+        {'schema': 'chess'},
+    )
+
+    zobrist = Column(BigInteger, nullable=False)
+    game_id = Column(String(255), nullable=False)
+    ply = Column(SmallInteger, nullable=False)
 
 class GamePlayer(Base):
     """
     Association table linking Games and Players.
     
     Attributes:
-        game_id (String): Foreign Key to games.game_id.
+        game_id (String): References games.game_id.
         player_id (Text): Foreign Key to players.player_id.
+        created_at (TIMESTAMP): Copy of games.created_at. Partition key.
         color (Text): 'white' or 'black'.
         rating (Integer): Player's rating in this game.
         rating_diff (Integer): Rating change after this game.
     """
     __tablename__ = 'game_players'
     __table_args__ = (
-        PrimaryKeyConstraint('game_id', 'player_id'),
-        {'schema': 'chess'},
+        PrimaryKeyConstraint('game_id', 'player_id', 'created_at'),
+        {'schema': 'chess', 'postgresql_partition_by': 'RANGE (created_at)'},
     )
     
-    game_id = Column(String(255), ForeignKey('chess.games.game_id', ondelete='CASCADE'), nullable=False)
+    game_id = Column(String(255), nullable=False)
     player_id = Column(Text, ForeignKey('chess.players.player_id', ondelete='CASCADE'), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
     color = Column(Text, nullable=False)
     rating_diff = Column(Integer)
     rating = Column(Integer)
 
+class PlayerStats(Base):
+    """
+    Per-player, per-perf aggregates maintained at ingest time.
+
+    Rows are updated in the same transaction that links a player to a game,
+    and only when that link is new, so re-ingesting a game is a no-op.
+
+    Attributes:
+        player_id (Text): Foreign Key to players.player_id.
+        perf (String): Performance category (bullet, blitz, rapid, ...).
+        games (Integer): Number of finished games counted.
+        wins (Integer): Games won.
+        draws (Integer): Games drawn.
+        losses (Integer): Games lost.
+        last_rating (Integer): Rating in the most recent game.
+        peak_rating (Integer): Highest rating seen.
+        last_game_at (TIMESTAMP): last_move_at of the most recent game.
+    """
+    __tablename__ = 'player_stats'
+    __table_args__ = (
+        PrimaryKeyConstraint('player_id', 'perf'),
+        {'schema': 'chess'},
+    )
+
+    player_id = Column(Text, ForeignKey('chess.players.player_id', ondelete='CASCADE'), nullable=False)
+    perf = Column(String(50), nullable=False)
+    games = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    last_rating = Column(Integer)
+    peak_rating = Column(Integer)
+    last_game_at = Column(TIMESTAMP(timezone=True))
+
 class GameMetrics(Base):
     """
     Stores metric values for a specific game in a JSONB column.
@@ -126,12 +201,15 @@ class GameMetrics(Base):
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    game_id = Column(Text, ForeignKey('chess.games.game_id', ondelete='CASCADE'), unique=True, nullable=False)
+    game_id = Column(Text, unique=True, nullable=False)
     metrics = Column(JSONB, nullable=False, default={})
 
 class AnalyticsType(Base):
     """
     Lookup table for types of analytics.
+
+    `version` is the plugin's own version string; `revision` is bumped each
+    time it changes, so stale results can be found with an integer comparison.
     """
     __tablename__ = 'analytics_types'
     __table_args__ = {'schema': 'chess'}
@@ -140,19 +218,40 @@ class AnalyticsType(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(Text)
     version = Column(String(50))
+    revision = Column(Integer, nullable=False, server_default='1')
 
 class AnalysisStatus(Base):
     """
-    Tracks the status of an analytic for a specific game.
+    Tracks the status of an analytic for a specific game, and which version of
+    the analytic produced it. A row whose `analytic_revision` is below the
+    analytic's current revision is stale and due for re-analysis.
     """
     __tablename__ = 'analysis_status'
     __table_args__ = (
         Index('ix_analysis_status_game_analytic', 'game_id', 'analytic_id', unique=True),
+        Index('ix_analysis_status_analytic_revision', 'analytic_id', 'analytic_revision'),
         {'schema': 'chess'}
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    game_id = Column(String(255), ForeignKey('chess.games.game_id', ondelete='CASCADE'), nullable=False)
+    game_id = Column(String(255), nullable=False)
     analytic_id = Column(Integer, ForeignKey('chess.analytics_types.id', ondelete='CASCADE'), nullable=False)
     status = Column(String(50), nullable=False)  # e.g., 'completed', 'failed', 'pending'
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    analytic_version = Column(String(50))
+    analytic_revision = Column(Integer, nullable=False, server_default='1')
+
+class AnalysisCursor(Base):
+    """
+    Keyset position of a pending-games scan, persisted between runs.
+
+    One row per scan scope (asset and ordering). The last key written is
+    stored, so the next run resumes after it; a NULL key means start over.
+    """
+    __tablename__ = 'analysis_cursors'
+    __table_args__ = {'schema': 'chess'}
+
+    scope = Column(String(255), primary_key=True)
+    last_created_at = Column(TIMESTAMP(timezone=True))
+    last_game_id = Column(String(255))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
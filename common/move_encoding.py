@@ -0,0 +1,96 @@
+"""
+Compact binary encoding for move lists.
+
+A game's mainline is stored as one `bytea`: a little-endian uint16 per ply.
+
+    bits 0-5    from square (python-chess numbering, a1 = 0 ... h8 = 63)
+    bits 6-11   to square
+    bits 12-14  promotion piece type (0 = none, 2-5 = knight..queen)
+
+A 40-move game is 160 bytes, compared with 80 rows of (id, game_id, move_number, SAN)
+in the old `game_moves` table. Encoding and decoding work on whole arrays with NumPy;
+only SAN rendering has to replay the board.
+"""
+
+from typing import Optional, Sequence
+
+import chess
+import numpy as np
+
+MOVE_DTYPE = np.dtype('<u2')
+
+_FROM_MASK = 0x3F
+_TO_SHIFT = 6
+_PROMOTION_SHIFT = 12
+_PROMOTION_SUFFIX = np.array(["", "", "n", "b", "r", "q", "", ""])
+_SQUARE_NAMES = np.array(chess.SQUARE_NAMES)
+
+
+def pack_moves(from_squares: np.ndarray, to_squares: np.ndarray, promotions: np.ndarray) -> np.ndarray:
+    """Packs parallel square/promotion arrays into the uint16 move index."""
+    return (
+        from_squares.astype(MOVE_DTYPE)
+        | (to_squares.astype(MOVE_DTYPE) << _TO_SHIFT)
+        | (promotions.astype(MOVE_DTYPE) << _PROMOTION_SHIFT)
+    ).astype(MOVE_DTYPE)
+
+
+def unpack_moves(packed: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Splits a uint16 move index into (from_squares, to_squares, promotions) arrays."""
+    packed = packed.astype(np.uint16, copy=False)
+    return (
+        packed & _FROM_MASK,
+        (packed >> _TO_SHIFT) & _FROM_MASK,
+        (packed >> _PROMOTION_SHIFT) & 0x7,
+    )
+
+
+def encode_moves(moves: Sequence[chess.Move]) -> bytes:
+    """Encodes python-chess moves to the packed `bytea` form."""
+    count = len(moves)
+    from_squares = np.fromiter((m.from_square for m in moves), dtype=np.uint16, count=count)
+    to_squares = np.fromiter((m.to_square for m in moves), dtype=np.uint16, count=count)
+    promotions = np.fromiter((m.promotion or 0 for m in moves), dtype=np.uint16, count=count)
+    return pack_moves(from_squares, to_squares, promotions).tobytes()
+
+
+def encode_uci(moves: Sequence[str]) -> bytes:
+    """Encodes UCI strings (e.g. "e2e4", "e7e8q") to the packed `bytea` form."""
+    return encode_moves([chess.Move.from_uci(m) for m in moves])
+
+
+def as_array(data: bytes) -> np.ndarray:
+    """Zero-copy view of packed moves as a uint16 array."""
+    return np.frombuffer(data, dtype=MOVE_DTYPE)
+
+
+def decode_moves(data: bytes) -> list[chess.Move]:
+    """Decodes packed moves back to python-chess moves."""
+    from_squares, to_squares, promotions = unpack_moves(as_array(data))
+    return [
+        chess.Move(int(f), int(t), int(p) or None)
+        for f, t, p in zip(from_squares, to_squares, promotions)
+    ]
+
+
+def decode_uci(data: bytes) -> list[str]:
+    """Decodes packed moves to UCI strings without touching a board."""
+    from_squares, to_squares, promotions = unpack_moves(as_array(data))
+    uci = np.char.add(
+        np.char.add(_SQUARE_NAMES[from_squares], _SQUARE_NAMES[to_squares]),
+        _PROMOTION_SUFFIX[promotions],
+    )
+    return uci.tolist()
+
+
+def decode_san(data: bytes, initial_fen: Optional[str] = None, chess960: bool = False) -> list[str]:
+    """
+    Decodes packed moves to SAN.
+    SAN depends on the position, so this replays the game from `initial_fen`.
+    """
+    board = chess.Board(initial_fen, chess960=chess960) if initial_fen else chess.Board(chess960=chess960)
+    san = []
+    for move in decode_moves(data):
+        san.append(board.san(move))
+        board.push(move)
+    return san
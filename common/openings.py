@@ -0,0 +1,65 @@
+"""
+ECO opening classification.
+
+The bundled table (`data/eco.tsv`, same columns as lichess-org/chess-openings:
+eco, name, pgn) is compiled once per process into a trie keyed by UCI moves.
+Classifying a game walks its moves down the trie and keeps the deepest named
+node, so the cost is bounded by the length of the longest opening line, not
+by the game.
+"""
+
+import csv
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import chess
+
+ECO_TABLE = Path(__file__).parent / "data" / "eco.tsv"
+
+
+class _Node:
+    __slots__ = ("children", "eco", "name")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.eco: Optional[str] = None
+        self.name: Optional[str] = None
+
+
+def _pgn_to_uci(pgn: str) -> list[str]:
+    board = chess.Board()
+    return [
+        board.push_san(token).uci()
+        for token in pgn.split()
+        if not token[0].isdigit()  # skip move numbers ("1.")
+    ]
+
+
+@lru_cache(maxsize=1)
+def opening_trie(path: Path = ECO_TABLE) -> _Node:
+    """Loads the ECO table into a move trie (cached per process)."""
+    root = _Node()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            node = root
+            for uci in _pgn_to_uci(row["pgn"]):
+                node = node.children.setdefault(uci, _Node())
+            node.eco, node.name = row["eco"], row["name"]
+    return root
+
+
+def classify(uci_moves: Iterable[str]) -> Optional[tuple[str, str]]:
+    """
+    Returns (eco, name) of the longest known opening prefix of `uci_moves`,
+    or None if not even the first move is in the table.
+    """
+    node = opening_trie()
+    found = None
+    for uci in uci_moves:
+        node = node.children.get(uci)
+        if node is None:
+            break
+        if node.eco is not None:
+            found = (node.eco, node.name)
+    return found
@@ -0,0 +1,30 @@
+"""
+Zobrist keys for position lookups.
+
+Each ply of an ingested game is indexed in `chess.game_positions` under the
+64-bit polyglot Zobrist hash of the position after that ply. Postgres has no
+unsigned 64-bit type, so keys are stored as the two's-complement `bigint`.
+"""
+
+from typing import Iterable, Optional
+
+import chess
+import chess.polyglot
+
+_SIGN_BIT = 1 << 63
+
+
+def zobrist_key(board: chess.Board) -> int:
+    """Zobrist hash of `board` as a signed 64-bit integer (fits a `bigint`)."""
+    h = chess.polyglot.zobrist_hash(board)
+    return h - (1 << 64) if h & _SIGN_BIT else h
+
+
+def replay_keys(moves: Iterable[chess.Move], initial_fen: Optional[str] = None, chess960: bool = False) -> list[int]:
+    """Keys of the positions after each move, in ply order (ply 1 first)."""
+    board = chess.Board(initial_fen, chess960=chess960) if initial_fen else chess.Board(chess960=chess960)
+    keys = []
+    for move in moves:
+        board.push(move)
+        keys.append(zobrist_key(board))
+    return keys
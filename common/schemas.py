@@ -13,7 +13,7 @@ Naming Convention:
 
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 # =============================================================================
 # Game Schemas
@@ -42,6 +42,8 @@ class GameCreate(BaseModel):
     winner: Optional[str] = None
     pgn: Optional[str] = None
     clock: Clock  # Nested object in input
+    moves: Optional[str] = None  # Space-separated SAN; stored packed, not on the games row
+    initial_fen: Optional[str] = None
 
 class Game(BaseModel):
     """
@@ -63,6 +65,19 @@ class Game(BaseModel):
     clock_initial: int
     clock_increment: int
     clock_total_time: int
+    eco: Optional[str] = None
+    opening_name: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class OpeningStats(BaseModel):
+    """Schema for reading game counts and results for one opening."""
+    eco: str
+    opening_name: str
+    games: int
+    white_wins: int
+    draws: int
+    black_wins: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -88,16 +103,44 @@ class Player(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class PlayerStats(BaseModel):
+    """Schema for reading a player's aggregated record in one perf."""
+    player_id: str
+    perf: str
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    last_rating: Optional[int] = None
+    peak_rating: Optional[int] = None
+    last_game_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
 # =============================================================================
 # Move Schemas
 # =============================================================================
 
 class GameMove(BaseModel):
-    """Schema for a single move record."""
-    id: int
+    """Schema for a single stored move (ply) echoed back after ingestion."""
     game_id: str
     move_number: int
     move: str
+    uci: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class GameMoveList(BaseModel):
+    """Schema for reading a game's mainline in the requested notation."""
+    game_id: str
+    initial_fen: Optional[str] = None
+    notation: Literal["san", "uci"]
+    moves: list[str]
+
+class PositionGame(BaseModel):
+    """Schema for a game that reached a searched position, and the first ply it did so."""
+    game_id: str
+    ply: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -9,18 +9,27 @@ Key Patterns:
   This ensures idempotency: if we process the same game twice, we just update it.
 - Batching: Functions ending in `_batch` handle multiple records efficiently.
 - Locking: `get_next_player_to_process` uses `SKIP LOCKED` to safely coordinate multiple workers.
+- Partitions: `games`/`game_players` are partitioned by month of `created_at`.
+  Writers call `_ensure_partitions` first, and upserts conflict on keys that
+  include `created_at`.
+- Moves: games may arrive with their SAN moves; they are replayed once and
+  written as a packed `game_moves_packed` row plus `game_positions` Zobrist keys,
+  and the opening is classified onto the games row.
+- Derived tables: `player_stats` is folded forward in the same transaction as the
+  game/player link insert, using RETURNING to count only rows that were actually new.
 """
 
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import update, case
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import func, or_
-from common import models, schemas
+from common import models, schemas, move_encoding
+from common.openings import classify as classify_opening
 from datetime import datetime, timedelta, timezone
-from app.data_transformers import flatten_clock_data
-from app.utils import json_serializer
+from app.data_transformers import flatten_clock_data, aggregate_player_stats, pop_moves
+from app.utils import json_serializer, parse_and_enumerate_moves
 import sys
 import logging
 from typing import Optional
@@ -37,10 +46,64 @@ file_handler.setFormatter(formatter)
 logger.addHandler(stream_handler)
 logger.addHandler(file_handler)
 
+# =============================================================================
+# Partition Management
+# =============================================================================
+
+# Months (UTC, first day) this process already knows have partitions.
+_known_partition_months: set[datetime] = set()
+
+def _month_start(ts: datetime) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+async def _ensure_partitions(db: AsyncSession, created_ats: list[datetime]):
+    """
+    Makes sure games/game_players have partitions for the given months (plus the next one).
+
+    The DB function is idempotent and serialized with an advisory lock, so this
+    only short-circuits repeated calls; after the first game of a month it is free.
+    Months before the legacy partition's upper bound are already covered there.
+    """
+    months = {_month_start(ts) for ts in created_ats} - _known_partition_months
+    if not months:
+        return
+
+    await db.execute(
+        select(func.chess.ensure_game_partitions(min(months), max(months) + timedelta(days=31)))
+    )
+    _known_partition_months.update(months)
+
 # =============================================================================
 # Game Operations
 # =============================================================================
 
+def _parse_ingest_moves(game_data: dict) -> Optional[tuple[str, list[dict], Optional[str]]]:
+    """
+    Pops `moves`/`initial_fen` off a game dict, replays them once and
+    classifies the opening into `eco`/`opening_name` on the dict.
+
+    Returns:
+        A `_store_moves` entry, or None if the game has no replayable moves.
+        Games with illegal moves are still stored, just without moves.
+    """
+    moves, variant, initial_fen = pop_moves(game_data)
+    game_data['eco'] = game_data['opening_name'] = None
+    if not moves:
+        return None
+    game_id = game_data['game_id']
+    try:
+        enumerated = parse_and_enumerate_moves(game_id, moves, variant, initial_fen)
+    except ValueError as e:
+        logger.warning(f"Storing game {game_id} without moves: {e}")
+        return None
+    stored_fen = initial_fen if initial_fen and initial_fen != "start" else None
+    if stored_fen is None and variant == "standard":
+        opening = classify_opening(m['uci'] for m in enumerated)
+        if opening:
+            game_data['eco'], game_data['opening_name'] = opening
+    return game_id, enumerated, stored_fen
+
 async def create_game(db: AsyncSession, game: schemas.GameCreate):
     """
     Creates or Updates (Upsert) a single game.
@@ -55,21 +118,27 @@ async def create_game(db: AsyncSession, game: schemas.GameCreate):
     # Convert game to a dict and extract the clock data
     game_data = game.dict()  # This converts the Pydantic model to a dictionary
     game_data = flatten_clock_data(game_data)
+    game_moves = _parse_ingest_moves(game_data)
+
+    await _ensure_partitions(db, [game_data['created_at']])
 
     # Create an upsert statement (insert on conflict)
-    # If game_id exists, update all fields.
+    # If the game exists, update all fields. created_at is part of the key
+    # because it is the partition key; it never changes for a game.
     stmt = insert(models.Game).values(**game_data).on_conflict_do_update(
-        index_elements=['game_id'],  # on game_id conflict do update
+        index_elements=['game_id', 'created_at'],
         set_=game_data       # Fields to update in case of conflict
     )
 
     # Execute the statement
     await db.execute(stmt)
+    if game_moves:
+        await _store_moves(db, [game_moves])
     await db.commit()
 
     # Fetch the inserted/updated row for returning
     result = await db.execute(
-        select(models.Game).filter_by(game_id=game_data['game_id'])
+        select(models.Game).filter_by(game_id=game_data['game_id'], created_at=game_data['created_at'])
     )
     return result.scalar_one()
 
@@ -83,19 +152,26 @@ async def create_games_batch(db: AsyncSession, games: list[schemas.GameCreate]):
     
     # Prepare data
     games_data = []
+    games_moves = []
     for game in games:
         g_data = game.dict()
         g_data = flatten_clock_data(g_data)
+        g_moves = _parse_ingest_moves(g_data)
+        if g_moves:
+            games_moves.append(g_moves)
         games_data.append(g_data)
 
+    await _ensure_partitions(db, [g['created_at'] for g in games_data])
+
     # Upsert statement
     stmt = insert(models.Game).values(games_data)
     stmt = stmt.on_conflict_do_update(
-        index_elements=['game_id'],
+        index_elements=['game_id', 'created_at'],
         set_={col.name: stmt.excluded[col.name] for col in models.Game.__table__.columns}
     )
 
     await db.execute(stmt)
+    await _store_moves(db, games_moves)
     await db.commit()
     
     # Return inserted games
@@ -103,11 +179,84 @@ async def create_games_batch(db: AsyncSession, games: list[schemas.GameCreate]):
     result = await db.execute(select(models.Game).where(models.Game.game_id.in_(game_ids)))
     return result.scalars().all()
 
-async def get_games(db: AsyncSession, skip: int = 0, limit: int = 10):
-    """Fetches a paginated list of games."""
-    result = await db.execute(select(models.Game).offset(skip).limit(limit))
+async def get_games(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 10,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Fetches a paginated list of games.
+    A `since`/`until` range on created_at lets Postgres prune partitions.
+    """
+    stmt = select(models.Game)
+    if since is not None:
+        stmt = stmt.where(models.Game.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(models.Game.created_at < until)
+    result = await db.execute(stmt.offset(skip).limit(limit))
     return result.scalars().all()
 
+async def get_opening_stats(
+    db: AsyncSession,
+    player_id: Optional[str] = None,
+    perf: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+):
+    """
+    Counts games and results per opening (a GROUP BY on the classified eco).
+    Optionally restricted to one player's games, a perf, and a created_at range.
+    """
+    Game = models.Game
+    stmt = (
+        select(
+            Game.eco,
+            Game.opening_name,
+            func.count().label('games'),
+            func.count().filter(Game.winner == 'white').label('white_wins'),
+            func.count().filter(Game.winner.is_(None)).label('draws'),
+            func.count().filter(Game.winner == 'black').label('black_wins'),
+        )
+        .where(Game.eco.is_not(None))
+        .group_by(Game.eco, Game.opening_name)
+        .order_by(func.count().desc(), Game.eco)
+        .limit(limit)
+    )
+    if player_id is not None:
+        stmt = stmt.join(
+            models.GamePlayer,
+            (models.GamePlayer.game_id == Game.game_id)
+            & (models.GamePlayer.created_at == Game.created_at),
+        ).where(models.GamePlayer.player_id == player_id)
+    if perf is not None:
+        stmt = stmt.where(Game.perf == perf)
+    if since is not None:
+        stmt = stmt.where(Game.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Game.created_at < until)
+    result = await db.execute(stmt)
+    return result.mappings().all()
+
+async def get_games_by_position(db: AsyncSession, zobrist: int, skip: int = 0, limit: int = 100):
+    """
+    Finds games that reached the position with the given Zobrist key.
+    Returns (game_id, ply) pairs with the first ply the position occurred at.
+    Served by an index-only scan on the game_positions primary key.
+    """
+    stmt = (
+        select(models.GamePosition.game_id, func.min(models.GamePosition.ply).label('ply'))
+        .where(models.GamePosition.zobrist == zobrist)
+        .group_by(models.GamePosition.game_id)
+        .order_by(models.GamePosition.game_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.mappings().all()
+
 async def get_players_from_game(db: AsyncSession, lichess_id: str):
     """Fetches all players associated with a specific game ID."""
     result = await db.execute(select(models.GamePlayer).filter(models.GamePlayer.lichess_game_id == lichess_id))
@@ -172,7 +321,9 @@ async def get_last_move_time_for_player(db: AsyncSession, player_id: str) -> int
     Gets the timestamp of the most recent move for a specific player.
     """
     stmt = select(func.max(models.Game.last_move_at)).join(
-        models.GamePlayer, models.Game.game_id == models.GamePlayer.game_id
+        models.GamePlayer,
+        (models.Game.game_id == models.GamePlayer.game_id)
+        & (models.Game.created_at == models.GamePlayer.created_at)
     ).where(models.GamePlayer.player_id == player_id)
     
     result = await db.execute(stmt)
@@ -247,36 +398,160 @@ async def get_player_by_lichess_id(db: AsyncSession, lichess_id: str):
     result = await db.execute(select(models.Player).filter(models.Player.lichess_id == lichess_id))
     return result.scalars().first()
 
+async def get_player_stats(db: AsyncSession, player_id: str, perf: Optional[str] = None):
+    """Fetches a player's aggregated stats (primary-key lookup), optionally for one perf."""
+    stmt = select(models.PlayerStats).where(models.PlayerStats.player_id == player_id)
+    if perf is not None:
+        stmt = stmt.where(models.PlayerStats.perf == perf)
+    result = await db.execute(stmt.order_by(models.PlayerStats.perf))
+    return result.scalars().all()
+
+async def _get_link_games(db: AsyncSession, game_ids: set[str]) -> dict[str, dict]:
+    """Fetches the game columns that link inserts need (partition key and result), keyed by game_id."""
+    result = await db.execute(
+        select(
+            models.Game.game_id,
+            models.Game.created_at,
+            models.Game.perf,
+            models.Game.winner,
+            models.Game.status,
+            models.Game.last_move_at,
+        ).where(models.Game.game_id.in_(game_ids))
+    )
+    return {row.game_id: row._asdict() for row in result}
+
+async def _update_player_stats(db: AsyncSession, links: list[dict], games: dict[str, dict]):
+    """
+    Folds newly inserted game/player links into chess.player_stats.
+
+    Only pass links returned by the insert itself (not the request payload),
+    otherwise re-ingesting a game would count it twice. Does not commit: the
+    caller commits together with the link insert.
+    """
+    if not links:
+        return
+
+    rows = aggregate_player_stats(links, games)
+    if not rows:
+        return
+
+    stats = models.PlayerStats.__table__.c
+    stmt = insert(models.PlayerStats).values(rows)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['player_id', 'perf'],
+        set_={
+            'games': stats.games + excluded.games,
+            'wins': stats.wins + excluded.wins,
+            'draws': stats.draws + excluded.draws,
+            'losses': stats.losses + excluded.losses,
+            # GREATEST ignores NULLs, so a missing side never wins
+            'peak_rating': func.greatest(stats.peak_rating, excluded.peak_rating),
+            'last_rating': case(
+                (
+                    (stats.last_game_at == None) | (excluded.last_game_at >= stats.last_game_at),
+                    excluded.last_rating,
+                ),
+                else_=stats.last_rating,
+            ),
+            'last_game_at': func.greatest(stats.last_game_at, excluded.last_game_at),
+        }
+    )
+    await db.execute(stmt)
+
 # =============================================================================
 # Move & Link Operations
 # =============================================================================
 
-async def add_moves(db: AsyncSession, game_id: str, moves: list[dict]):
+# Columns returned by link inserts; only rows that were really inserted come back.
+_LINK_COLUMNS = (
+    models.GamePlayer.game_id,
+    models.GamePlayer.player_id,
+    models.GamePlayer.color,
+    models.GamePlayer.rating,
+)
+
+async def _store_moves(db: AsyncSession, games: list[tuple[str, list[dict], Optional[str]]]):
     """
-    Bulk insert moves for a game.
+    Writes packed moves and position keys for several games (no commit).
+
+    Args:
+        games: (game_id, enumerated moves, initial_fen) per game. Moves come from
+            `utils.parse_and_enumerate_moves` and carry `uci` and `zobrist`.
     """
-    # Map each move dictionary to the model
-    db_moves = [models.GameMove(**move) for move in moves]
-    
-    db.add_all(db_moves)
+    if not games:
+        return
+
+    move_rows = [
+        {
+            'game_id': game_id,
+            'initial_fen': initial_fen,
+            'ply_count': len(moves),
+            'moves': move_encoding.encode_uci([m['uci'] for m in moves]),
+        }
+        for game_id, moves, initial_fen in games
+    ]
+    stmt = insert(models.GameMoves).values(move_rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['game_id'],
+        set_={col: stmt.excluded[col] for col in ('initial_fen', 'ply_count', 'moves')}
+    )
+    await db.execute(stmt)
+
+    position_rows = [
+        {'zobrist': m['zobrist'], 'game_id': game_id, 'ply': m['move_number']}
+        for game_id, moves, _ in games
+        for m in moves
+    ]
+    if position_rows:
+        # executemany: SQLAlchemy pages this into multi-row INSERTs.
+        await db.execute(insert(models.GamePosition).on_conflict_do_nothing(), position_rows)
+
+async def add_moves(db: AsyncSession, game_id: str, moves: list[dict], initial_fen: Optional[str] = None):
+    """
+    Stores a game's moves as one packed row (upsert) plus its position keys.
+
+    Args:
+        moves: Enumerated moves from `utils.parse_and_enumerate_moves` (SAN, UCI, Zobrist).
+        initial_fen: Starting position, or None for the standard start.
+
+    Returns:
+        The moves that were stored.
+    """
+    await _store_moves(db, [(game_id, moves, initial_fen)])
     await db.commit()
-    return db_moves
+    return moves
+
+async def get_moves(db: AsyncSession, game_id: str):
+    """Fetches a game's packed moves row."""
+    result = await db.execute(select(models.GameMoves).where(models.GameMoves.game_id == game_id))
+    return result.scalar_one_or_none()
 
 async def add_player_to_game(db: AsyncSession, game_id: str, player: schemas.GamePlayerCreate):
     """
     Links a player to a game (Insert on Conflict Do Nothing).
+    A new link also updates the player's stats in the same transaction.
     """
     player_data = player.model_dump() # convert to dict
+    games = await _get_link_games(db, {player_data['game_id']})
+    game = games.get(player_data['game_id'])
+    if game is None:
+        logger.warning(f"Cannot link {player_data['player_id']} to unknown game {player_data['game_id']}")
+        return None
+    player_data['created_at'] = game['created_at']
+
     statement = insert(models.GamePlayer).values(**player_data).on_conflict_do_nothing(
-        index_elements=['game_id','player_id']
-    )
-    await db.execute(statement)
+        index_elements=['game_id', 'player_id', 'created_at']
+    ).returning(*_LINK_COLUMNS)
+    result = await db.execute(statement)
+    await _update_player_stats(db, [row._asdict() for row in result], games)
     await db.commit()
 
     result = await db.execute(
         select(models.GamePlayer).where( # where is more verbose than filter_by
             models.GamePlayer.game_id == player_data['game_id'],
-            models.GamePlayer.player_id == player_data['player_id']
+            models.GamePlayer.player_id == player_data['player_id'],
+            models.GamePlayer.created_at == player_data['created_at']
         )
     )
 
@@ -284,18 +559,26 @@ async def add_player_to_game(db: AsyncSession, game_id: str, player: schemas.Gam
     return db_game_player
 
 async def add_players_to_games_batch(db: AsyncSession, game_players: list[schemas.GamePlayerCreate]):
-    """Batch link players to games."""
+    """Batch link players to games, updating stats for the links that are new."""
     if not game_players:
         return []
 
     data = [gp.model_dump() for gp in game_players]
+    games = await _get_link_games(db, {d['game_id'] for d in data})
+    missing = [d for d in data if d['game_id'] not in games]
+    if missing:
+        logger.warning(f"Skipping {len(missing)} links to unknown games: {[d['game_id'] for d in missing]}")
+    data = [dict(d, created_at=games[d['game_id']]['created_at']) for d in data if d['game_id'] in games]
+    if not data:
+        return []
     
     stmt = insert(models.GamePlayer).values(data)
     stmt = stmt.on_conflict_do_nothing(
-        index_elements=['game_id', 'player_id']
-    )
+        index_elements=['game_id', 'player_id', 'created_at']
+    ).returning(*_LINK_COLUMNS)
 
-    await db.execute(stmt)
+    result = await db.execute(stmt)
+    await _update_player_stats(db, [row._asdict() for row in result], games)
     await db.commit()
     
     return [models.GamePlayer(**d) for d in data]
@@ -1,5 +1,6 @@
 # data_transformers.py
 from datetime import datetime
+from typing import Optional
 
 def flatten_clock_data(game_data: dict) -> dict:
     """Extracts and flattens 'clock' data into individual fields for the game."""
@@ -43,4 +44,74 @@ def enumerate_moves(game_data: dict) -> list[dict]:
         }
         for i, move in enumerate(moves)
     ]
-    return enumerated_moves
\ No newline at end of file
+    return enumerated_moves
+
+# Variants whose moves replay on a standard python-chess board. Other variants
+# (crazyhouse, atomic, ...) are stored without moves or positions.
+REPLAYABLE_VARIANTS = {"standard", "chess960", "fromPosition"}
+
+def pop_moves(game_data: dict) -> tuple[list[str], str, Optional[str]]:
+    """
+    Removes the ingest-only move fields from a game dict.
+
+    Returns:
+        (SAN moves, variant, initial_fen). Moves are empty when the game has none
+        or its variant cannot be replayed.
+    """
+    moves = (game_data.pop('moves', None) or "").split()
+    initial_fen = game_data.pop('initial_fen', None)
+    variant = game_data.get('variant', 'standard')
+    if variant not in REPLAYABLE_VARIANTS:
+        moves = []
+    return moves, variant, initial_fen
+
+# Lichess statuses for games that never reached a result. They are still linked
+# to their players but do not count towards player_stats.
+UNSCORED_STATUSES = {"created", "started", "aborted", "noStart", "unknownFinish"}
+
+def aggregate_player_stats(links: list[dict], games: dict[str, dict]) -> list[dict]:
+    """
+    Folds newly inserted game/player links into one player_stats delta per (player_id, perf).
+
+    Args:
+        links: Inserted game_players rows (game_id, player_id, color, rating).
+        games: Game rows keyed by game_id (perf, winner, status, last_move_at).
+
+    Returns:
+        Rows shaped like chess.player_stats, holding only this batch's contribution.
+    """
+    deltas = {}
+    for link in links:
+        game = games.get(link["game_id"])
+        if game is None or game["status"] in UNSCORED_STATUSES:
+            continue
+
+        key = (link["player_id"], game["perf"])
+        row = deltas.setdefault(key, {
+            "player_id": link["player_id"],
+            "perf": game["perf"],
+            "games": 0,
+            "wins": 0,
+            "draws": 0,
+            "losses": 0,
+            "last_rating": None,
+            "peak_rating": None,
+            "last_game_at": None,
+        })
+
+        row["games"] += 1
+        if game["winner"] is None:
+            row["draws"] += 1
+        elif game["winner"] == link["color"]:
+            row["wins"] += 1
+        else:
+            row["losses"] += 1
+
+        rating = link.get("rating") or None  # Lichess reports 0 for unrated/anonymous
+        if rating is not None and (row["peak_rating"] is None or rating > row["peak_rating"]):
+            row["peak_rating"] = rating
+        if row["last_game_at"] is None or game["last_move_at"] >= row["last_game_at"]:
+            row["last_game_at"] = game["last_move_at"]
+            row["last_rating"] = rating
+
+    return list(deltas.values())
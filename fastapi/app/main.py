@@ -17,14 +17,17 @@ import sys
 from fastapi import FastAPI, Depends, HTTPException, Body, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, utils
-from common import schemas, database
+from common import schemas, database, move_encoding
+from common.positions import zobrist_key
+import chess
 import logging
 import coloredlogs
 
 # =============================================================================
 # Logging Setup
 # =============================================================================
-from typing import Optional
+from typing import Literal, Optional
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 coloredlogs.install(level='INFO', logger=logger)
@@ -79,9 +82,18 @@ async def create_games_batch(games: list[schemas.GameCreate], db: AsyncSession =
     return db_games
 
 @app.get("/games/", response_model=list[schemas.Game])
-async def get_games(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    """Retrieves a paginated list of games."""
-    games = await crud.get_games(db, skip=skip, limit=limit)
+async def get_games(
+    skip: int = 0,
+    limit: int = 10,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retrieves a paginated list of games.
+    Optional `since`/`until` bound created_at, which prunes monthly partitions.
+    """
+    games = await crud.get_games(db, skip=skip, limit=limit, since=since, until=until)
     return games
 
 @app.get("/games/get_last_move_played_time", response_model=schemas.LastMoveTimeResponse)
@@ -109,7 +121,8 @@ async def add_moves(
 ):
     """
     Parses and stores moves for a game.
-    Input is a space-separated string of SAN moves.
+    Input is a space-separated string of SAN moves; they are stored packed,
+    one row per game (see common.move_encoding).
     """
     game_moves = moves.model_dump()
     move_list = game_moves.get("moves", "").split()
@@ -117,12 +130,71 @@ async def add_moves(
     initial_fen = game_moves.get("initial_fen")
     try:
         enumerated_moves = utils.parse_and_enumerate_moves(game_id, move_list, variant, initial_fen)
-        db_move = await crud.add_moves(db, game_id, enumerated_moves)
+        stored_fen = initial_fen if initial_fen and initial_fen != "start" else None
+        db_move = await crud.add_moves(db, game_id, enumerated_moves, stored_fen)
         return db_move
     except ValueError as e:
         logger.warning(f"Skipping game {game_id} due to invalid move: {e}")
         return []
 
+@app.get("/games/{game_id}/moves/", response_model=schemas.GameMoveList)
+async def get_moves(
+    game_id: str,
+    notation: Literal["san", "uci"] = "san",
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns a game's mainline in SAN or UCI.
+    UCI is decoded straight from the packed array; SAN replays the board.
+    """
+    db_moves = await crud.get_moves(db, game_id)
+    if db_moves is None:
+        raise HTTPException(status_code=404, detail="Moves not found")
+    if notation == "uci":
+        decoded = move_encoding.decode_uci(db_moves.moves)
+    else:
+        decoded = move_encoding.decode_san(db_moves.moves, db_moves.initial_fen)
+    return {
+        "game_id": game_id,
+        "initial_fen": db_moves.initial_fen,
+        "notation": notation,
+        "moves": decoded,
+    }
+
+@app.get("/openings/", response_model=list[schemas.OpeningStats])
+async def get_opening_stats(
+    player_id: Optional[str] = None,
+    perf: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns game counts and results per opening, most played first.
+    Openings are classified at ingest, so this is a plain GROUP BY.
+    """
+    return await crud.get_opening_stats(
+        db, player_id=player_id, perf=perf, since=since, until=until, limit=limit
+    )
+
+@app.get("/positions/{fen:path}/games", response_model=list[schemas.PositionGame])
+async def get_games_by_position(
+    fen: str,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Lists games that reached the position given as FEN.
+    The FEN is hashed to its Zobrist key and looked up in chess.game_positions.
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid FEN: {e}")
+    return await crud.get_games_by_position(db, zobrist_key(board), skip=skip, limit=limit)
+
 # =============================================================================
 # Player Endpoints
 # =============================================================================
@@ -156,6 +228,17 @@ async def update_player_fetched(player_id: str, db: AsyncSession = Depends(get_d
     await crud.update_player_fetched_at(db, player_id)
     return {"status": "ok"}
 
+@app.get("/players/{player_id}/stats", response_model=list[schemas.PlayerStats])
+async def get_player_stats(player_id: str, perf: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Returns a player's aggregated record per perf (games, W/D/L, ratings).
+    Served from chess.player_stats by primary key; no scan of game_players.
+    """
+    stats = await crud.get_player_stats(db, player_id, perf)
+    if not stats:
+        raise HTTPException(status_code=404, detail="No stats for player")
+    return stats
+
 @app.get("/players/{lichess_id}", response_model=schemas.Player)
 async def get_player(lichess_id: str, db: AsyncSession = Depends(get_db)):
     """Retrieves a player by Lichess ID."""
@@ -172,6 +255,8 @@ async def get_player(lichess_id: str, db: AsyncSession = Depends(get_db)):
 async def add_player_to_game(game_id: str, player: schemas.GamePlayerCreate, db: AsyncSession = Depends(get_db)):
     """Links a player to a game."""
     db_game_player = await crud.add_player_to_game(db, game_id, player)
+    if db_game_player is None:
+        raise HTTPException(status_code=404, detail="Game not found")
     return db_game_player
 
 @app.post("/games/players/batch", response_model=list[schemas.GamePlayer], status_code=status.HTTP_201_CREATED)
@@ -3,6 +3,8 @@ from datetime import datetime
 import chess
 # import chess.pgn
 
+from common.positions import zobrist_key
+
 def json_serializer(json_to_post: dict) -> dict:
     if isinstance(json_to_post, datetime):
         return json_to_post.isoformat()
@@ -10,6 +12,8 @@ def json_serializer(json_to_post: dict) -> dict:
 def parse_and_enumerate_moves(game_id: str, moves: list[str], variant: str = "standard", initial_fen: str = None) -> list[dict]:
     """
     Parses and enumerates a list of chess moves.
+    Each entry carries the UCI form and the Zobrist key of the resulting
+    position, so a game is replayed only once at ingest.
     """
     if initial_fen and initial_fen != "start":
         board = chess.Board(initial_fen, chess960=(variant == "chess960"))
@@ -20,11 +24,13 @@ def parse_and_enumerate_moves(game_id: str, moves: list[str], variant: str = "st
 
     for move_number, move in enumerate(moves, start=1):
         try:
-            board.push_san(move)  # Push the move to the board (validates the move)
+            parsed = board.push_san(move)  # Push the move to the board (validates the move)
             move_data.append({
                 "game_id": game_id,
                 "move_number": move_number,
                 "move": move,
+                "uci": parsed.uci(),
+                "zobrist": zobrist_key(board),
             })
         except ValueError as e:
             import logging
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from datetime import datetime
 
 # =============================================================================
@@ -191,6 +191,16 @@ async def test_get_games_with_pagination(client):
         assert mock_get.call_args[1]["skip"] == 10
         assert mock_get.call_args[1]["limit"] == 5
 
+@pytest.mark.anyio
+async def test_get_games_with_date_range(client):
+    """Date range is passed through so the query can prune partitions"""
+    with patch("app.crud.get_games", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = []
+        response = await client.get("/games/?since=2024-01-01T00:00:00Z&until=2024-02-01T00:00:00Z")
+        assert response.status_code == 200
+        assert mock_get.call_args[1]["since"].month == 1
+        assert mock_get.call_args[1]["until"].month == 2
+
 @pytest.mark.anyio
 async def test_get_games_pagination_boundaries(client):
     """Test edge cases for pagination"""
@@ -252,6 +262,74 @@ async def test_add_moves(client):
         # Verify parser was called with correct arguments
         mock_parse.assert_called_once_with("test123", ["e4", "e5"], "standard", None)
 
+@pytest.mark.anyio
+async def test_get_moves(client):
+    from common.move_encoding import encode_uci
+    db_moves = MagicMock(moves=encode_uci(["e2e4", "e7e5", "g1f3"]), initial_fen=None)
+    with patch("app.crud.get_moves", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = db_moves
+        response = await client.get("/games/test123/moves/")
+        assert response.status_code == 200
+        assert response.json()["moves"] == ["e4", "e5", "Nf3"]
+
+        response = await client.get("/games/test123/moves/", params={"notation": "uci"})
+        assert response.json()["moves"] == ["e2e4", "e7e5", "g1f3"]
+
+@pytest.mark.anyio
+async def test_get_moves_not_found(client):
+    with patch("app.crud.get_moves", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = None
+        response = await client.get("/games/missing/moves/")
+        assert response.status_code == 404
+
+@pytest.mark.anyio
+async def test_get_games_by_position(client):
+    import chess
+    from common.positions import zobrist_key
+    board = chess.Board()
+    board.push_san("e4")
+    with patch("app.crud.get_games_by_position", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = [{"game_id": "test123", "ply": 1}]
+        response = await client.get(f"/positions/{board.fen()}/games")
+        assert response.status_code == 200
+        assert response.json() == [{"game_id": "test123", "ply": 1}]
+        assert mock_get.call_args[0][1] == zobrist_key(board)
+
+@pytest.mark.anyio
+async def test_get_games_by_position_invalid_fen(client):
+    response = await client.get("/positions/not-a-fen/games")
+    assert response.status_code == 400
+
+@pytest.mark.anyio
+async def test_get_opening_stats(client):
+    with patch("app.crud.get_opening_stats", new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = [{
+            "eco": "B90", "opening_name": "Sicilian Defense: Najdorf Variation",
+            "games": 3, "white_wins": 1, "draws": 1, "black_wins": 1,
+        }]
+        response = await client.get("/openings/?player_id=test_player&perf=blitz")
+        assert response.status_code == 200
+        assert response.json()[0]["eco"] == "B90"
+        assert mock_get.call_args[1]["player_id"] == "test_player"
+        assert mock_get.call_args[1]["perf"] == "blitz"
+
+def test_classify_opening():
+    """The deepest named prefix wins; moves after the book line are ignored."""
+    from common.openings import classify
+    najdorf = ["e2e4", "c7c5", "g1f3", "d7d6", "d2d4", "c5d4", "f3d4", "g8f6", "b1c3", "a7a6", "c1e3"]
+    assert classify(najdorf) == ("B90", "Sicilian Defense: Najdorf Variation")
+    assert classify(najdorf[:2]) == ("B20", "Sicilian Defense")
+    assert classify([]) is None
+
+def test_move_encoding_round_trip():
+    """Promotions survive packing; SAN decoding replays from the stored FEN."""
+    from common.move_encoding import encode_uci, decode_uci, decode_san
+    fen = "8/P7/8/8/8/8/8/k6K w - - 0 1"
+    data = encode_uci(["a7a8q", "a1b2"])
+    assert len(data) == 4
+    assert decode_uci(data) == ["a7a8q", "a1b2"]
+    assert decode_san(data, fen) == ["a8=Q+", "Kb2"]
+
 @pytest.mark.anyio
 async def test_add_moves_invalid_format(client):
     """Test add_moves with invalid move format - should return empty array"""
@@ -408,6 +486,55 @@ async def test_get_player_not_found(client):
         response = await client.get("/players/nonexistent")
         assert response.status_code == 404
 
+@pytest.mark.anyio
+async def test_get_player_stats(client):
+    with patch("app.crud.get_player_stats", new_callable=AsyncMock) as mock:
+        mock.return_value = [
+            {
+                "player_id": "test",
+                "perf": "blitz",
+                "games": 10,
+                "wins": 6,
+                "draws": 1,
+                "losses": 3,
+                "last_rating": 1510,
+                "peak_rating": 1550,
+                "last_game_at": datetime.now()
+            }
+        ]
+        response = await client.get("/players/test/stats?perf=blitz")
+        assert response.status_code == 200
+        assert response.json()[0]["wins"] == 6
+        mock.assert_called_once()
+        assert mock.call_args[0][1:] == ("test", "blitz")
+
+@pytest.mark.anyio
+async def test_get_player_stats_not_found(client):
+    with patch("app.crud.get_player_stats", new_callable=AsyncMock) as mock:
+        mock.return_value = []
+        response = await client.get("/players/nobody/stats")
+        assert response.status_code == 404
+
+def test_aggregate_player_stats():
+    """Only finished games count; last rating follows the latest game."""
+    from app.data_transformers import aggregate_player_stats
+    earlier, later = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    games = {
+        "g1": {"perf": "blitz", "winner": "white", "status": "mate", "last_move_at": later},
+        "g2": {"perf": "blitz", "winner": None, "status": "draw", "last_move_at": earlier},
+        "g3": {"perf": "blitz", "winner": None, "status": "aborted", "last_move_at": later},
+    }
+    links = [
+        {"game_id": "g1", "player_id": "p", "color": "black", "rating": 1490},
+        {"game_id": "g2", "player_id": "p", "color": "white", "rating": 1520},
+        {"game_id": "g3", "player_id": "p", "color": "white", "rating": 1600},
+    ]
+    [row] = aggregate_player_stats(links, games)
+    assert (row["games"], row["wins"], row["draws"], row["losses"]) == (2, 0, 1, 1)
+    assert row["last_rating"] == 1490
+    assert row["peak_rating"] == 1520
+    assert row["last_game_at"] == later
+
 # =============================================================================
 # Game-Player Link Tests
 # =============================================================================
@@ -438,6 +565,19 @@ async def test_add_player_to_game(client):
 
 
 
+@pytest.mark.anyio
+async def test_add_player_to_unknown_game(client):
+    with patch("app.crud.add_player_to_game", new_callable=AsyncMock) as mock:
+        mock.return_value = None
+        payload = {
+            "game_id": "missing",
+            "player_id": "player1",
+            "color": "white",
+            "rating": 1500
+        }
+        response = await client.post("/games/missing/players/", json=payload)
+        assert response.status_code == 404
+
 @pytest.mark.anyio
 async def test_add_players_batch(client):
     with patch("app.crud.add_players_to_games_batch", new_callable=AsyncMock) as mock:
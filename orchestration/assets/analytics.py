@@ -1,109 +1,137 @@
-from dagster import asset, Output, AssetContext
+from typing import Optional
+
+from dagster import (
+    asset, define_asset_job, schedule,
+    AssetContext, AssetSelection, Config, MonthlyPartitionsDefinition, Output, RunRequest,
+)
 from common.analytics.registry import discover_analytics
 from common.analytics.base import BaseAnalytic
+from common.analytics.runner import run_pending, run_stale, PENDING_BATCH_SIZE
 from common.database import AsyncSessionLocal
-from common.models import Game, AnalysisStatus, AnalyticsType, GameMetrics
-from sqlalchemy import select, and_
-from sqlalchemy.dialects.postgresql import insert
-import chess.pgn
-import io
-import asyncio
 
 # Discover plugins
 analytics_plugins = discover_analytics()
 
+# Per-plugin assets are partitioned by month of games.last_move_at. end_offset=1
+# includes the current, still filling month so it can materialize incrementally.
+monthly_partitions = MonthlyPartitionsDefinition(start_date="2010-06-01", end_offset=1)
+
+
+class AnalyticsRunConfig(Config):
+    """
+    Run config of the analytics assets.
+
+    A run resumes the pending-games scan from the asset's persisted cursor and
+    keeps going until it has been through every game once, or until
+    `max_games` / `max_seconds` runs out.
+    """
+    batch_size: int = PENDING_BATCH_SIZE  # rows fetched per round trip of the scan
+    order: str = "game_id"  # "game_id" or "created_at" (oldest games first)
+    max_games: Optional[int] = None
+    max_seconds: Optional[float] = 600.0
+    workers: Optional[int] = None  # default: ANALYTICS_WORKERS
+    chunk_size: Optional[int] = None  # default: ANALYTICS_CHUNK_SIZE
+
+
+class AnalyticsPartitionConfig(AnalyticsRunConfig):
+    """
+    Run config of one month partition. Backfills get their parallelism from
+    running partitions side by side (see the dagster/backfill limit in
+    dagster.yaml), so a partition runs on one core and, by default, to the end.
+    """
+    max_seconds: Optional[float] = None
+    workers: Optional[int] = 1
+
+
+async def _run(
+    context: AssetContext,
+    config: AnalyticsRunConfig,
+    plugins: list[BaseAnalytic],
+    scope: str,
+    last_move_window=None,
+) -> Output:
+    result = await run_pending(
+        AsyncSessionLocal,
+        plugins,
+        scope=scope,
+        order=config.order,
+        batch_size=config.batch_size,
+        max_games=config.max_games,
+        max_seconds=config.max_seconds,
+        last_move_window=last_move_window,
+        workers=config.workers,
+        chunk_size=config.chunk_size,
+        log=context.log,
+    )
+    return Output(result.games, metadata={"count": result.games, "complete": result.complete})
+
 def make_analytic_asset(plugin_class: type[BaseAnalytic]):
     plugin = plugin_class()
     asset_name = f"analytic_{plugin.name}"
-    
-    @asset(name=asset_name, group_name="analytics")
-    async def analytic_asset(context: AssetContext):
-        async with AsyncSessionLocal() as session:
-            # 1. Ensure AnalyticType exists
-            stmt = insert(AnalyticsType).values(
-                name=plugin.name,
-                version=plugin.version
-            ).on_conflict_do_update(
-                index_elements=['name'],
-                set_=dict(version=plugin.version)
-            ).returning(AnalyticsType.id)
-            
-            result = await session.execute(stmt)
-            analytic_id = result.scalar_one()
-            
-            # 2. Find games needing analysis (Left Join)
-            # SELECT g.game_id, g.pgn FROM games g 
-            # LEFT JOIN analysis_status s ON g.game_id = s.game_id AND s.analytic_id = :id 
-            # WHERE s.id IS NULL
-            # LIMIT 100 (Batch size)
-            
-            subq = select(AnalysisStatus.id).where(
-                and_(
-                    AnalysisStatus.game_id == Game.game_id,
-                    AnalysisStatus.analytic_id == analytic_id
-                )
-            ).exists()
-            
-            query = select(Game).where(~subq).limit(100)
-            result = await session.execute(query)
-            games_to_analyze = result.scalars().all()
-            
-            context.log.info(f"Found {len(games_to_analyze)} games to analyze for {plugin.name}")
-            
-            for game_row in games_to_analyze:
-                try:
-                    # Parse PGN
-                    pgn = io.StringIO(game_row.pgn)
-                    game = chess.pgn.read_game(pgn)
-                    
-                    # Analyze
-                    metrics = plugin.analyze(game)
-                    
-                    # Update Metrics
-                    # We need to merge metrics. This is a bit complex with JSONB in async SA.
-                    # For now, let's just fetch, update, save.
-                    # Ideally we use jsonb_set or similar but python-side merge is easier for MVP.
-                    
-                    # Upsert GameMetrics
-                    # Check if exists
-                    gm_query = select(GameMetrics).where(GameMetrics.game_id == game_row.game_id)
-                    gm_result = await session.execute(gm_query)
-                    gm = gm_result.scalar_one_or_none()
-                    
-                    if not gm:
-                        gm = GameMetrics(game_id=game_row.game_id, metrics={})
-                        session.add(gm)
-                    
-                    # Update dict
-                    current_metrics = dict(gm.metrics) if gm.metrics else {}
-                    current_metrics.update({plugin.name: metrics})
-                    gm.metrics = current_metrics
-                    
-                    # Mark Status
-                    status = AnalysisStatus(
-                        game_id=game_row.game_id,
-                        analytic_id=analytic_id,
-                        status="completed",
-                        updated_at=game_row.last_move_at # or now()
-                    )
-                    session.add(status)
-                    
-                except Exception as e:
-                    context.log.error(f"Failed to analyze game {game_row.game_id}: {e}")
-                    # Mark as failed
-                    status = AnalysisStatus(
-                        game_id=game_row.game_id,
-                        analytic_id=analytic_id,
-                        status="failed",
-                        updated_at=game_row.last_move_at
-                    )
-                    session.add(status)
-            
-            await session.commit()
-            
-        return Output(len(games_to_analyze), metadata={"count": len(games_to_analyze)})
+
+    @asset(name=asset_name, group_name="analytics", partitions_def=monthly_partitions)
+    async def analytic_asset(context: AssetContext, config: AnalyticsPartitionConfig):
+        # Same runner as the fused asset, restricted to this plugin and month.
+        window = context.partition_time_window
+        return await _run(
+            context, config, [plugin],
+            scope=f"{asset_name}:{context.partition_key}",
+            last_move_window=(window.start, window.end),
+        )
 
     return analytic_asset
 
+@asset(name="analytics_fused", group_name="analytics")
+async def fused_analytics_asset(context: AssetContext, config: AnalyticsRunConfig):
+    """
+    Runs every registered plugin in one pass: each pending game is loaded,
+    parsed and replayed once no matter how many plugins there are.
+    """
+    plugins = [plugin_class() for plugin_class in analytics_plugins]
+    if not plugins:
+        return Output(0, metadata={"count": 0})
+    return await _run(context, config, plugins, "analytics_fused")
+
+class ReanalysisConfig(Config):
+    """Run config of the re-analysis asset."""
+    max_games: Optional[int] = None
+    games_per_second: Optional[float] = 50.0
+    chunk_size: Optional[int] = None  # default: ANALYTICS_CHUNK_SIZE
+
+@asset(name="analytics_reanalysis", group_name="analytics")
+async def reanalysis_asset(context: AssetContext, config: ReanalysisConfig):
+    """
+    Recomputes results produced by an older version of a plugin, touching only
+    the stale (game, plugin) rows, at a bounded rate.
+    """
+    plugins = [plugin_class() for plugin_class in analytics_plugins]
+    if not plugins:
+        return Output(0, metadata={"count": 0})
+    result = await run_stale(
+        AsyncSessionLocal,
+        plugins,
+        max_games=config.max_games,
+        games_per_second=config.games_per_second,
+        chunk_size=config.chunk_size,
+        log=context.log,
+    )
+    return Output(result.games, metadata={"count": result.games, "complete": result.complete})
+
 # Create assets list
 analytic_assets = [make_analytic_asset(plugin) for plugin in analytics_plugins]
+
+analytic_partitions_job = define_asset_job(
+    "analytic_partitions_job",
+    selection=AssetSelection.assets(*analytic_assets),
+    partitions_def=monthly_partitions,
+)
+
+@schedule(job=analytic_partitions_job, cron_schedule="0 * * * *")
+def analytic_partitions_schedule(context):
+    """
+    Keeps the newest partitions up to date: the current month, and the previous
+    one for games ingested after it ended. Each run resumes from its cursor.
+    """
+    partition_keys = monthly_partitions.get_partition_keys(current_time=context.scheduled_execution_time)
+    for partition_key in partition_keys[-2:]:
+        yield RunRequest(partition_key=partition_key)
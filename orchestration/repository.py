@@ -4,8 +4,13 @@ from dagster import repository, asset
 def hello_lichess():
     return "Hello, Twins!"
 
-from orchestration.assets.analytics import analytic_assets
+from orchestration.assets.analytics import (
+    analytic_assets, fused_analytics_asset, reanalysis_asset, analytic_partitions_job, analytic_partitions_schedule,
+)
 
 @repository
 def lichess_repo():
-    return [hello_lichess, *analytic_assets]
\ No newline at end of file
+    return [
+        hello_lichess, *analytic_assets, fused_analytics_asset, reanalysis_asset,
+        analytic_partitions_job, analytic_partitions_schedule,
+    ]
\ No newline at end of file